@@ -19,6 +19,7 @@ def copy_resources(dist_dir, project_root):
         "shaders/overlay_shader.glsl",
         "shaders/uv_wire_vs.glsl",
         "shaders/uv_wire_ps.glsl",
+        "shaders/brush_shader.glsl",
         "background.png",
         "style.qss",
         "app_settings.json",
@@ -237,6 +238,7 @@ def main():
         "shaders/overlay_shader.glsl",
         "shaders/uv_wire_vs.glsl",
         "shaders/uv_wire_ps.glsl",
+        "shaders/brush_shader.glsl",
         "background.png",
         "style.qss",
         "app_settings.json",
@@ -20,14 +20,14 @@ class BrushStrokeCommand(Command):
 
     def undo(self):
         if self.flowmap_data_before is not None:
-            self.canvas.flowmap_data = self.flowmap_data_before.copy()
-            self.canvas.update_texture_from_data()
+            # 只上传与当前数据不同的区域
+            self.canvas.replace_flowmap_data(self.flowmap_data_before.copy())
             self.canvas.update()
 
     def redo(self):
         if self.flowmap_data_after is not None:
-            self.canvas.flowmap_data = self.flowmap_data_after.copy()
-            self.canvas.update_texture_from_data()
+            # 只上传与当前数据不同的区域
+            self.canvas.replace_flowmap_data(self.flowmap_data_after.copy())
             self.canvas.update()
 
 
@@ -1,6 +1,7 @@
 import sys
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import Qt, QCoreApplication
 import os
 from main_window import MainWindow
 from localization import translator
@@ -43,6 +44,10 @@ def set_taskbar_icon(icon_path):
         print(f"设置任务栏图标时出错: {e}")
 
 if __name__ == '__main__':
+    # 合并同一帧内的高频鼠标移动事件，笔刷会在相邻采样点之间插值，笔迹不会断开；
+    # 数位板事件保持逐个传递，保留压感和轨迹精度
+    QCoreApplication.setAttribute(Qt.AA_CompressHighFrequencyEvents, True)
+    QCoreApplication.setAttribute(Qt.AA_CompressTabletEvents, False)
     app = QApplication(sys.argv)
     
     # 设置应用程序图标 - 处理打包后的路径
@@ -154,12 +154,15 @@ class MainWindow(QMainWindow):
 
     def on_drawing_started(self):
         """绘制开始时保存当前状态用于撤销并更新笔刷状态"""
+        self.canvas_widget.sync_flowmap_from_gpu()
         self.current_flowmap_data = self.canvas_widget.flowmap_data.copy()
         if hasattr(self, 'brush_cursor'):
             self.brush_cursor.set_drawing_state(True)
 
     def on_drawing_finished(self):
         """绘制结束时创建并执行撤销命令并更新笔刷状态"""
+        # GPU 笔刷直接绘制在纹理上，先读回到 flowmap_data
+        self.canvas_widget.sync_flowmap_from_gpu()
         # 检查是否有实际的绘制变化
         if np.array_equal(self.current_flowmap_data, self.canvas_widget.flowmap_data):
             # 数据完全相同，不需要创建撤销命令
@@ -326,6 +329,7 @@ class MainWindow(QMainWindow):
             if uv_group:
                 uv_group.setVisible(True)
             self.canvas_widget.uv_wire_enabled = True
+            self.canvas_widget.update()
             # 切换到3D快捷键显示
             if hasattr(self.panel_manager, '_update_shortcut_display'):
                 self.panel_manager._update_shortcut_display(True)
@@ -342,6 +346,7 @@ class MainWindow(QMainWindow):
             if uv_group:
                 uv_group.setVisible(False)
             self.canvas_widget.uv_wire_enabled = False
+            self.canvas_widget.update()
             # 切换回2D快捷键显示
             if hasattr(self.panel_manager, '_update_shortcut_display'):
                 self.panel_manager._update_shortcut_display(False)
@@ -596,6 +601,7 @@ class MainWindow(QMainWindow):
             read_fn=lambda: float(c.flow_speed),
             apply_fn=lambda v, transient=False: (
                 setattr(c, "flow_speed", float(v)),
+                c.update(),
                 pm.update_flow_speed_label(float(v)),
                 self._set_slider_value_no_signal(pm.get_control("flow_speed_slider"), int(round(float(v) * 100)))
             )
@@ -607,6 +613,7 @@ class MainWindow(QMainWindow):
             read_fn=lambda: float(c.flow_distortion),
             apply_fn=lambda v, transient=False: (
                 setattr(c, "flow_distortion", float(v)),
+                c.update(),
                 pm.update_flow_distortion_label(float(v)),
                 self._set_slider_value_no_signal(pm.get_control("flow_distortion_slider"), int(round(float(v) * 100)))
             )
@@ -661,7 +668,7 @@ class MainWindow(QMainWindow):
             read_fn=lambda: float(c.uv_wire_opacity),
             apply_fn=lambda v, transient=False: (
                 setattr(c, "uv_wire_opacity", float(v)),
-                None
+                c.update()
             )
         )
         self.param_registry.register(
@@ -669,7 +676,7 @@ class MainWindow(QMainWindow):
             read_fn=lambda: float(c.uv_wire_line_width),
             apply_fn=lambda v, transient=False: (
                 setattr(c, "uv_wire_line_width", float(v)),
-                None
+                c.update()
             )
         )
 
@@ -4,12 +4,16 @@ from PyQt5.QtGui import QMouseEvent, QTabletEvent, QImage, QVector2D, QCursor
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from OpenGL.error import GLError
+from OpenGL.raw.GL.VERSION.GL_1_0 import glGetTexImage as glGetTexImageRaw
+from OpenGL.raw.GL.VERSION.GL_1_0 import glReadPixels as glReadPixelsRaw
 from PIL import Image
 import numpy as np
 import ctypes
+import math
 import time
 import enum
 import os
+import brush_kernels
 
 # 鼠标状态枚举，用于优化状态检查
 class MouseState(enum.Enum):
@@ -19,6 +23,15 @@ class MouseState(enum.Enum):
     DRAG_PREVIEW = 3 # 拖拽预览视图
     DRAG_MAIN = 4   # 拖拽主视图
 
+# 衰减系数低于该值的像素，单次笔刷的改变量小于半精度纹理的精度，绘制时直接跳过
+FALLOFF_EPSILON = 1.0 / 4096
+
+# 模糊笔刷只处理衰减系数大于该值的像素
+BLUR_FALLOFF_THRESHOLD = 0.01
+
+# 叠加层的不透明度低于该值时，在 8 位帧缓冲上混合不会改变任何像素，直接跳过绘制
+MIN_VISIBLE_OPACITY = 0.5 / 255.0
+
 # 笔刷数据类，缓存常用的计算结果
 class BrushData:
     def __init__(self):
@@ -33,9 +46,55 @@ class BrushData:
         self.flow_g = 0.5       # 绿色分量
         self.strength = 0.0     # 笔刷强度
         self.needs_seamless = False  # 是否需要四方连续处理
-        self.mirror_positions = []   # 需要镜像的位置列表
         self.dist_sq_cache = None    # 距离场缓存
-        self.falloff_cache = None    # 衰减系数缓存
+        self.falloff_cache = None    # 衰减系数缓存（float32，用于绘制）
+        self.falloff_cache64 = None  # 衰减系数缓存（float64，用于阈值判断）
+        self.blur_mask_cache = None  # 模糊笔刷需要处理的像素掩码
+        self.cache_radius = None     # 当前缓存对应的笔刷半径
+        self.cache_half_size = 0     # 缓存表的半边长，表尺寸为 (2 * half + 1) 的正方形
+        self.active_half_cache = {}  # 不同阈值下有效衰减范围的半边长
+
+    def get_falloff_lut(self, radius):
+        """返回以笔刷中心为原点的衰减系数表及其半边长
+
+        衰减表只在半径变化时重新计算，同一半径的所有笔刷点（包括四方连续的镜像）
+        直接从表中截取对应窗口，不再逐点计算距离场。
+        """
+        if self.falloff_cache is None or self.cache_radius != radius:
+            # 多留一个像素余量，保证笔刷包围盒总是落在表内
+            half = math.ceil(radius) + 1
+            y_offsets, x_offsets = np.ogrid[-half:half + 1, -half:half + 1]
+            self.dist_sq_cache = (x_offsets * x_offsets + y_offsets * y_offsets).astype(np.float32)
+            # 与之前逐点计算的衰减函数一致：(1 - d²/r²)² ，超出半径为0
+            # 以 float64 计算，阈值判断与之前逐点计算时的结果相同；绘制使用 float32 副本
+            falloff = np.maximum(0.0, 1.0 - self.dist_sq_cache.astype(np.float64) / (radius * radius))
+            falloff *= falloff
+            self.falloff_cache64 = falloff
+            self.falloff_cache = falloff.astype(np.float32)
+            self.blur_mask_cache = None
+            self.cache_radius = radius
+            self.cache_half_size = half
+            self.active_half_cache = {}
+        return self.falloff_cache, self.cache_half_size
+
+    def get_active_half_size(self, radius, threshold):
+        """返回衰减系数大于 threshold 的像素距笔刷中心的最大偏移，没有时返回 -1"""
+        self.get_falloff_lut(radius)
+        active_half = self.active_half_cache.get(threshold)
+        if active_half is None:
+            # 衰减随距离单调递减，中心行上最后一个超过阈值的位置即为范围
+            half = self.cache_half_size
+            active = np.nonzero(self.falloff_cache64[half, half:] > threshold)[0]
+            active_half = int(active[-1]) if active.size else -1
+            self.active_half_cache[threshold] = active_half
+        return active_half
+
+    def get_blur_mask(self, radius):
+        """返回与衰减系数表对应的掩码，标记模糊笔刷需要处理的像素"""
+        self.get_falloff_lut(radius)
+        if self.blur_mask_cache is None:
+            self.blur_mask_cache = self.falloff_cache64 > BLUR_FALLOFF_THRESHOLD
+        return self.blur_mask_cache
 
 # 基础顶点着色器
 VERTEX_SHADER_SOURCE = """
@@ -54,6 +113,15 @@ void main()
 
 PREVIEW_FRAGMENT_SHADER_SOURCE = None
 
+# 全屏四边形的顶点数据：每个顶点为 (x, y, u, v)，正好 16 字节，所有实例共用
+QUAD_VERTICES = np.array([
+    -1.0,  1.0,  0.0, 1.0,
+    -1.0, -1.0,  0.0, 0.0,
+     1.0,  1.0,  1.0, 1.0,
+     1.0, -1.0,  1.0, 0.0,
+], dtype=np.float32)
+QUAD_VERTICES.setflags(write=False)
+
 # --- Helper Function for Shader Compilation ---
 def create_shader_program(vertex_source, fragment_source):
     """编译顶点和片段着色器，并链接成一个程序"""
@@ -84,6 +152,15 @@ def create_shader_program(vertex_source, fragment_source):
         # 可以尝试更详细地检查哪个阶段失败，但 compileProgram 通常足够
         return 0 # 返回 0 表示失败
 
+def get_uniform_locations(program, names):
+    """查询 program 中各 uniform 的位置，返回名称到位置的字典
+
+    program 无效或 uniform 不存在（例如被编译器优化掉）时位置为 -1。
+    """
+    if program == 0:
+        return {name: -1 for name in names}
+    return {name: glGetUniformLocation(program, name) for name in names}
+
 class FlowmapCanvas(QOpenGLWidget):
     # 信号，当 flowmap 更新时发出，用于更新预览等
     flowmap_updated = pyqtSignal()
@@ -102,7 +179,7 @@ class FlowmapCanvas(QOpenGLWidget):
         super().__init__(parent)
 
         self.texture_size = size
-        self.last_pos = QPoint()
+        self.last_pos = QPointF()
         self.mouse_state = MouseState.IDLE  # 使用枚举代替多个布尔标志
         self.brush_radius = 40.0 # 笔刷半径 (像素)
         self.brush_strength = 0.5 # 笔刷强度 [0, 1]
@@ -115,6 +192,8 @@ class FlowmapCanvas(QOpenGLWidget):
         self.base_brush_radius = 40.0  # 基础笔刷半径（无压感时）
         self.base_brush_strength = 0.5  # 基础笔刷强度（无压感时）
         self.is_tablet_input = False  # 标记当前是否为数位板输入
+        self.pressure_history = (0.0, 0.0)  # 最近两次（过滤后的）笔压，用于识别笔压突变
+        self.pressure_spike_count = 0  # 连续被判定为突变的笔压采样数
         
         # 笔压响应参数（可配置）
         self.pressure_size_min = 0.2  # 大小最小值（基础大小的百分比）
@@ -135,9 +214,9 @@ class FlowmapCanvas(QOpenGLWidget):
         self.initial_brush_strength = 0.5  # 按下S键时的初始笔刷强度
 
         # 绘制优化参数
-        self.last_draw_time = 0  # 上次绘制时间
+        self.last_draw_time = 0  # 上次绘制时间（单调时钟，整数毫秒）
         self.draw_throttle_ms = 16  # 绘制节流时间，约60fps
-        self.accumulated_positions = []  # 累积的位置，用于节流期间保存鼠标位置
+        self.pending_draw_pos = None  # 节流期间最新的鼠标位置，绘制时只需要最后一个点
         self.update_pending = False  # 是否有待处理的更新
 
         # 主视图控制
@@ -160,25 +239,36 @@ class FlowmapCanvas(QOpenGLWidget):
         self.main_view_offset_correction_x = 0.0  # X方向的偏移校正
         self.main_view_offset_correction_y = 0.0  # Y方向的偏移校正
         self.preview_aspect_ratio = 1.0  # 预览窗口的宽高比，默认为1:1
+        self.aspect_ratio_key = None  # 上次计算纵横比校正时的 (纹理尺寸, 窗口宽, 窗口高)
+        self.preview_size_key = None  # 上次计算预览窗口大小时的 (纹理尺寸, 窗口宽, 窗口高)
         # cover 模式下的屏幕->内容校正参数（传给shader）
         self.aspect_scale_x = 1.0
         self.aspect_scale_y = 1.0
         self.aspect_offset_x = 0.0
         self.aspect_offset_y = 0.0
 
-        # Flowmap 数据 (H, W, RGBA)
-        self.flowmap_data = np.zeros((self.texture_size[1], self.texture_size[0], 4), dtype=np.float32)
-        self.flowmap_data[..., 0] = 0.5
-        self.flowmap_data[..., 1] = 0.5
-        self.flowmap_data[..., 3] = 1.0
+        # Flowmap 数据 (H, W, RG)，只保存流向用到的 R/G 两个通道
+        self.flowmap_data = np.full((self.texture_size[1], self.texture_size[0], 2), 0.5, dtype=np.float32)
 
         self.flowmap_texture_id = 0
         self.base_texture_id = 0
+        # 两张纹理当前已分配存储的尺寸，尺寸不变时只更新内容，不重新分配
+        self.flowmap_texture_alloc_size = None
+        self.base_texture_alloc_size = None
         self.has_base_map = False
+        # 设置环境变量 FLOWMAP_GL_DEBUG 时，纹理上传后额外用 glGetError 检查错误；
+        # glGetError 会让驱动等待之前的命令执行完毕，默认关闭
+        self.gl_debug = bool(os.environ.get("FLOWMAP_GL_DEBUG"))
 
         self.shader_program_id = 0
         self.preview_shader_program_id = 0
         self.overlay_shader_program_id = 0
+        # 各 shader program 的 uniform 位置，在 init_shaders 中查询一次，绘制时直接使用
+        self.main_uniforms = {}
+        self.preview_uniforms = {}
+        self.overlay_uniforms = {}
+        self.brush_uniforms = {}
+        self.uv_wire_uniforms = {}
         self.overlay_texture_id = 0
         self.overlay_opacity = 0.5
         self.has_overlay = False
@@ -190,13 +280,34 @@ class FlowmapCanvas(QOpenGLWidget):
         self.vao = 0
         self.vbo = 0
 
-        # 顶点数据 (全屏四边形)
-        self.quad_vertices = np.array([
-            -1.0,  1.0,  0.0, 1.0,
-            -1.0, -1.0,  0.0, 0.0,
-             1.0,  1.0,  1.0, 1.0,
-             1.0, -1.0,  1.0, 0.0,
-        ], dtype=np.float32)
+        # Flowmap 纹理上传使用的 PBO 环形缓冲（GL_RG16F，每像素4字节）
+        self.pbo_ring = []  # PBO id 列表
+        self.pbo_ring_ptrs = []  # 持久映射时各 PBO 对应的 numpy 字节视图
+        self.pbo_ring_fences = []  # 各 PBO 最近一次上传对应的同步对象
+        self.pbo_ring_index = 0  # 下一个要使用的 PBO
+        self.pbo_ring_size = 3  # 环形缓冲中的 PBO 数量
+        self.pbo_slot_bytes = 4 * 1024 * 1024  # 每个 PBO 的容量，超出时直接从内存上传
+        self.pbo_persistent = False  # 是否使用 glBufferStorage 持久映射
+        # 等待在下一帧上传的修改区域，元素为 [min_x, min_y, max_x, max_y, 累计面积]
+        self.pending_dirty_regions = []
+
+        # GPU 笔刷：以 flowmap 纹理为渲染目标直接绘制，不可用时退回 CPU 实现
+        self.brush_shader_program_id = 0
+        self.brush_fbo = 0
+        self.brush_fbo_texture_id = 0  # FBO 当前附加的纹理，flowmap 纹理重建后需要重新附加
+        self.brush_scratch_texture_id = 0  # 模糊模式下保存影响区域副本的临时纹理
+        self.brush_scratch_size = (0, 0)
+        self.gpu_brush_enabled = True  # 是否允许使用 GPU 笔刷
+        self.gpu_brush_active = False  # 是否处于 begin_gpu_brush / end_gpu_brush 之间
+        self.gpu_brush_queueing = False  # apply_brush 中的笔刷点是否加入 GPU 队列
+        # 等待在下一帧开始时绘制的 GPU 笔刷点，元素为 apply_brush_effect_gpu 的参数
+        self.pending_gpu_dabs = []
+        self.flowmap_gpu_dirty = False  # GPU 纹理中有尚未同步到 flowmap_data 的修改
+        self.gpu_dirty_rect = None      # 尚未同步的修改的包围盒 [min_x, min_y, max_x, max_y]
+
+        # get_flowmap_preview 复用的缓冲区，纹理尺寸变化时重新分配
+        self.preview_bgra = None  # (H, W, 4) uint8，B=0、A=255 只在分配时写入
+        self.preview_scratch = None  # (H, W, 2) float32，缩放并限制范围后的 R/G
 
         # 3D 模型相关（保留）
         self.uv_data = None
@@ -207,9 +318,9 @@ class FlowmapCanvas(QOpenGLWidget):
         self.flow_distortion = 0.3
         self.base_scale = 1.0
         self.anim_time = 0.0
-        self.last_anim_update_time = time.time()
+        self.last_anim_update_time = time.monotonic()
         self.is_animating = True
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
 
         # Timer for animation update
         self.timer = QTimer(self)
@@ -220,6 +331,9 @@ class FlowmapCanvas(QOpenGLWidget):
         self.setMouseTracking(True)
 
         self.brush_data = BrushData()
+        # CPU 笔刷内核在确定需要 CPU 绘制时才编译，见 initializeGL
+        if not brush_kernels.is_available():
+            print(f"Warning: numba unavailable, CPU brush uses NumPy: {brush_kernels.get_import_error()}")
         self.is_drawing = False
         self.is_erasing = False
         self.is_dragging_preview = False
@@ -236,7 +350,7 @@ class FlowmapCanvas(QOpenGLWidget):
 
     def update_animation(self):
         """更新动画状态"""
-        current_time = time.time()
+        current_time = time.monotonic()
         delta_time = current_time - self.last_anim_update_time
         self.last_anim_update_time = current_time
 
@@ -244,7 +358,8 @@ class FlowmapCanvas(QOpenGLWidget):
         self.anim_time += delta_time
 
         # 处理缩放动画
-        if self.scale_animation_active:
+        scale_animating = self.scale_animation_active
+        if scale_animating:
             progress = min(1.0, (current_time - self.scale_animation_start_time) / self.scale_animation_duration)
             if progress >= 1.0:
                 self.main_view_scale = self.target_main_view_scale
@@ -258,14 +373,19 @@ class FlowmapCanvas(QOpenGLWidget):
                 # 插值当前值和目标值
                 self.main_view_scale = self.main_view_scale + (self.target_main_view_scale - self.main_view_scale) * ease
 
-                # 对偏移量进行插值
-                self.main_view_offset = QPointF(
-                    self.main_view_offset.x() + (self.target_main_view_offset.x() - self.main_view_offset.x()) * ease,
-                    self.main_view_offset.y() + (self.target_main_view_offset.y() - self.main_view_offset.y()) * ease
-                )
-
-        # 强制每帧更新，确保动画流畅
-        self.update()
+                # 对偏移量进行插值，直接修改当前的 QPointF，不再每帧创建新对象
+                # （动画开始时目标偏移总是新建的对象，不会与当前偏移共享）
+                offset = self.main_view_offset
+                target_offset = self.target_main_view_offset
+                offset_x = offset.x()
+                offset_y = offset.y()
+                offset.setX(offset_x + (target_offset.x() - offset_x) * ease)
+                offset.setY(offset_y + (target_offset.y() - offset_y) * ease)
+
+        # 只有底图的流动效果和缩放动画需要逐帧重绘（包括缩放动画结束的那一帧）；
+        # 其余状态变化由对应的操作自行请求重绘，静止的画布不再持续重绘
+        if scale_animating or (self.has_base_map and self.flow_speed != 0.0):
+            self.update()
 
     def initializeGL(self):
         """初始化OpenGL上下文"""
@@ -288,9 +408,17 @@ class FlowmapCanvas(QOpenGLWidget):
             
             # 初始化纹理
             self.init_textures()
+
+            # 初始化纹理上传用的 PBO 环形缓冲
+            self.init_pixel_buffers()
             
             # 初始化着色器
             self.init_shaders()
+
+            # GPU 笔刷不可用时所有笔刷都在 CPU 上绘制，此时预先编译（或从缓存加载）CPU 笔刷内核；
+            # GPU 笔刷可用时不编译，之后退回 CPU 绘制时内核在第一次使用时编译
+            if not self.is_gpu_brush_available():
+                self.warm_up_brush_kernels()
             
             # 设置初始宽高比
             self.texture_original_aspect_ratio = self.texture_size[0] / self.texture_size[1]
@@ -301,8 +429,8 @@ class FlowmapCanvas(QOpenGLWidget):
             self.update_preview_size()
             
             # 设置动画计时器
-            self.start_time = time.time()
-            self.last_anim_update_time = time.time()
+            self.start_time = time.monotonic()
+            self.last_anim_update_time = time.monotonic()
             
             # 发送OpenGL初始化完成信号
             self.opengl_initialized.emit()
@@ -326,7 +454,7 @@ class FlowmapCanvas(QOpenGLWidget):
 
         glBindVertexArray(self.vao)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.quad_vertices.nbytes, self.quad_vertices, GL_STATIC_DRAW)
+        glBufferData(GL_ARRAY_BUFFER, QUAD_VERTICES.nbytes, QUAD_VERTICES, GL_STATIC_DRAW)
 
         # 位置属性 (location = 0)
         # 使用 ctypes.c_void_p 进行偏移
@@ -351,9 +479,8 @@ class FlowmapCanvas(QOpenGLWidget):
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F,
-                           self.texture_size[0], self.texture_size[1], 0,
-                           GL_RGBA, GL_FLOAT, self.flowmap_data)
+        self.flowmap_texture_alloc_size = None
+        self.allocate_flowmap_texture(self.texture_size[0], self.texture_size[1])
 
         # --- Base Texture (Placeholder) ---
         texture_id = glGenTextures(1)
@@ -365,17 +492,175 @@ class FlowmapCanvas(QOpenGLWidget):
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
         white_pixel = np.array([[[128, 128, 128, 255]]], dtype=np.uint8) # Use grey placeholder
         glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 1, 1, 0, GL_RGBA, GL_UNSIGNED_BYTE, white_pixel)
+        self.base_texture_alloc_size = (1, 1)
 
         glBindTexture(GL_TEXTURE_2D, 0)
 
+    def allocate_flowmap_texture(self, width, height):
+        """把 flowmap_data 整张上传到当前绑定的 flowmap 纹理
+
+        只保存 R/G 两个通道，使用半精度浮点；尺寸与已分配的存储相同时直接覆盖内容，
+        不再调用 glTexImage2D 重新分配显存。
+        """
+        if self.flowmap_texture_alloc_size != (width, height):
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RG16F, width, height, 0,
+                         GL_RG, GL_HALF_FLOAT, None)
+            self.flowmap_texture_alloc_size = (width, height)
+        # 数据经由 PBO 环形缓冲上传
+        self.upload_flowmap_region(0, 0, width, height)
+
+    def init_pixel_buffers(self):
+        """创建用于 flowmap 局部上传的 PBO 环形缓冲
+
+        支持 glBufferStorage 时使用持久映射，否则每次上传用
+        GL_MAP_UNSYNCHRONIZED_BIT 映射；两种方式都依靠栅栏保证不覆写 GPU 正在读取的数据。
+        """
+        self.pbo_ring = []
+        self.pbo_ring_ptrs = []
+        self.pbo_ring_fences = []
+        self.pbo_ring_index = 0
+        self.pbo_persistent = False
+
+        size = self.pbo_slot_bytes
+        flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+        try:
+            use_storage = bool(glBufferStorage)
+        except Exception:
+            use_storage = False
+
+        try:
+            for _ in range(self.pbo_ring_size):
+                pbo = glGenBuffers(1)
+                glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+                ptr = None
+                if use_storage:
+                    glBufferStorage(GL_PIXEL_UNPACK_BUFFER, size, None, flags)
+                    address = glMapBufferRange(GL_PIXEL_UNPACK_BUFFER, 0, size, flags)
+                    if address:
+                        ptr = np.frombuffer((ctypes.c_ubyte * size).from_address(address), dtype=np.uint8)
+                    else:
+                        use_storage = False
+                if ptr is None:
+                    glBufferData(GL_PIXEL_UNPACK_BUFFER, size, None, GL_STREAM_DRAW)
+                self.pbo_ring.append(pbo)
+                self.pbo_ring_ptrs.append(ptr)
+                self.pbo_ring_fences.append(None)
+            self.pbo_persistent = use_storage and all(p is not None for p in self.pbo_ring_ptrs)
+        except Exception as e:
+            print(f"Warning: Failed to create PBO ring, falling back to direct uploads: {e}")
+            self.delete_pixel_buffers()
+        finally:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def delete_pixel_buffers(self):
+        """释放 PBO 环形缓冲及其同步对象"""
+        for fence in self.pbo_ring_fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        for pbo, ptr in zip(self.pbo_ring, self.pbo_ring_ptrs):
+            if ptr is not None:
+                glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+                glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+                glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        if self.pbo_ring:
+            glDeleteBuffers(len(self.pbo_ring), self.pbo_ring)
+        self.pbo_ring = []
+        self.pbo_ring_ptrs = []
+        self.pbo_ring_fences = []
+        self.pbo_ring_index = 0
+        self.pbo_persistent = False
+
+    @staticmethod
+    def flowmap_rg16(data):
+        """将 flowmap 的 R/G 数据转换为连续的半精度数组，用于 GL_RG/GL_HALF_FLOAT 上传"""
+        return np.ascontiguousarray(data, dtype=np.float16)
+
+    def upload_flowmap_region(self, x, y, width, height):
+        """将 flowmap_data 的一个矩形区域上传到已绑定的 flowmap 纹理
+
+        数据以 GL_RG/GL_HALF_FLOAT 格式直接转换写入 PBO 环形缓冲中的下一个 PBO，
+        再通过 glTexSubImage2D 从 PBO 偏移量上传，避免同步拷贝阻塞驱动。
+        每个 PBO 上传后插入栅栏，再次使用前等待 GPU 读完，因此非持久映射时
+        可以用 GL_MAP_UNSYNCHRONIZED_BIT 映射，跳过驱动的隐式同步。
+        调用前需绑定 flowmap 纹理并确保上下文有效。
+        """
+        if width <= 0 or height <= 0:
+            return
+
+        row_bytes = width * 4  # GL_RG + GL_HALF_FLOAT：每像素 4 字节
+        nbytes = row_bytes * height
+
+        # PBO 不可用时直接从内存上传
+        if not self.pbo_ring or row_bytes > self.pbo_slot_bytes:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height,
+                            GL_RG, GL_HALF_FLOAT,
+                            self.flowmap_rg16(self.flowmap_data[y:y + height, x:x + width]))
+            return
+
+        # 区域超过单个 PBO 容量时（例如整张大纹理）按行分带依次经由环形缓冲上传，
+        # 不再为整块区域分配一份半精度副本
+        if nbytes > self.pbo_slot_bytes:
+            band_rows = self.pbo_slot_bytes // row_bytes
+            for band_y in range(y, y + height, band_rows):
+                self.upload_flowmap_region(x, band_y, width, min(band_rows, y + height - band_y))
+            return
+
+        region = self.flowmap_data[y:y + height, x:x + width]
+
+        index = self.pbo_ring_index
+        self.pbo_ring_index = (index + 1) % len(self.pbo_ring)
+        pbo = self.pbo_ring[index]
+
+        # 等待 GPU 使用完该 PBO 上一次的数据后再覆写；超时或等待失败时 GPU 可能仍在读取，
+        # 不能写入该 PBO，这次改为直接从内存上传，保留栅栏供下次使用该 PBO 时再等待
+        fence = self.pbo_ring_fences[index]
+        if fence is not None:
+            status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1000000000)
+            if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height,
+                                GL_RG, GL_HALF_FLOAT, self.flowmap_rg16(region))
+                return
+            glDeleteSync(fence)
+            self.pbo_ring_fences[index] = None
+
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+        try:
+            if self.pbo_persistent:
+                mapped = self.pbo_ring_ptrs[index]
+            else:
+                address = glMapBufferRange(GL_PIXEL_UNPACK_BUFFER, 0, nbytes,
+                                           GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_RANGE_BIT |
+                                           GL_MAP_UNSYNCHRONIZED_BIT)
+                mapped = np.frombuffer((ctypes.c_ubyte * nbytes).from_address(address),
+                                       dtype=np.uint8) if address else None
+
+            if mapped is not None:
+                # 直接在映射内存中转换为半精度，不产生中间数组
+                target = mapped[:nbytes].view(np.float16).reshape(height, width, 2)
+                np.copyto(target, region, casting='unsafe')
+                if not self.pbo_persistent:
+                    glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+            else:
+                # 映射失败时重新分配存储，驱动可以在 GPU 仍使用旧数据时返回新的内存
+                glBufferData(GL_PIXEL_UNPACK_BUFFER, self.pbo_slot_bytes, None, GL_STREAM_DRAW)
+                glBufferSubData(GL_PIXEL_UNPACK_BUFFER, 0, nbytes, self.flowmap_rg16(region))
+
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height,
+                            GL_RG, GL_HALF_FLOAT, ctypes.c_void_p(0))
+
+            self.pbo_ring_fences[index] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        finally:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
     def load_overlay_image(self, file_path):
         """加载参考贴图到GPU纹理"""
         try:
             self.makeCurrent()
             img = Image.open(file_path).convert('RGBA')
             width, height = img.size
-            data = np.array(img, dtype=np.uint8)
-            data = np.flipud(data)
+            # 按图像原始行序（首行在上）上传，由 overlay_shader 采样时翻转 V 坐标，
+            # 避免在 CPU 上为整张图像再复制一份翻转后的数据
+            data = np.asarray(img, dtype=np.uint8)
 
             if self.overlay_texture_id == 0:
                 self.overlay_texture_id = glGenTextures(1)
@@ -434,6 +719,14 @@ class FlowmapCanvas(QOpenGLWidget):
             print(f"Failed to read overlay_texture_shader.glsl: {e}")
             self.overlay_shader_program_id = 0
 
+        # Brush Shader（GPU 笔刷，编译失败时使用 CPU 笔刷）
+        try:
+            with open("shaders/brush_shader.glsl", encoding="utf-8") as f:
+                self.brush_shader_program_id = create_shader_program(VERTEX_SHADER_SOURCE, f.read())
+        except Exception as e:
+            print(f"Failed to read brush_shader.glsl: {e}")
+            self.brush_shader_program_id = 0
+
         # UV wire program
         try:
             with open("shaders/uv_wire_vs.glsl", encoding="utf-8") as f:
@@ -445,8 +738,29 @@ class FlowmapCanvas(QOpenGLWidget):
             print(f"Failed to read UV wire shaders: {e}")
             self.uv_wire_program = 0
 
+        # 缓存 uniform 位置，避免每帧（以及每个笔刷点）重复按名称查询
+        self.main_uniforms = get_uniform_locations(self.shader_program_id, (
+            "baseMap", "u_hasBaseMap", "flowMap", "u_time", "u_flowSpeed", "u_flowDistortion",
+            "u_scale", "u_previewRepeat", "u_mainViewScale", "u_mainViewOffset", "u_useDirectX",
+            "u_aspectScale", "u_aspectOffset"))
+        self.preview_uniforms = get_uniform_locations(self.preview_shader_program_id, (
+            "flowMap", "u_previewOffset", "u_previewRepeat"))
+        self.overlay_uniforms = get_uniform_locations(self.overlay_shader_program_id, (
+            "overlayMap", "u_opacity", "u_mainViewScale", "u_mainViewOffset", "u_repeat",
+            "u_aspectScale", "u_aspectOffset"))
+        self.brush_uniforms = get_uniform_locations(self.brush_shader_program_id, (
+            "u_center", "u_radius", "u_flowColor", "u_strength", "u_blur",
+            "u_source", "u_regionMin", "u_regionSize", "u_sampleRadius"))
+        self.uv_wire_uniforms = get_uniform_locations(self.uv_wire_program, (
+            "u_mainViewScale", "u_mainViewOffset", "u_aspectScale", "u_aspectOffset",
+            "u_color", "u_opacity"))
+
     def paintGL(self):
         """绘制OpenGL内容"""
+        # 绘制本帧累积的 GPU 笔刷点，并上传 CPU 笔刷的修改
+        self.flush_gpu_dabs(release_context=False)
+        self.flush_dirty_regions()
+
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         # 检查 shader program ID 和 VAO 是否有效
         if self.shader_program_id == 0 or self.preview_shader_program_id == 0 or self.vao == 0:
@@ -457,18 +771,19 @@ class FlowmapCanvas(QOpenGLWidget):
 
             glUseProgram(self.shader_program_id)
 
-            # --- 获取 Uniform 位置并设置 ---
-            baseMapLoc = glGetUniformLocation(self.shader_program_id, "baseMap")
-            hasBaseMapLoc = glGetUniformLocation(self.shader_program_id, "u_hasBaseMap")
-            flowMapLoc = glGetUniformLocation(self.shader_program_id, "flowMap")
-            timeLoc = glGetUniformLocation(self.shader_program_id, "u_time")
-            speedLoc = glGetUniformLocation(self.shader_program_id, "u_flowSpeed")
-            distLoc = glGetUniformLocation(self.shader_program_id, "u_flowDistortion")
-            baseScaleLoc = glGetUniformLocation(self.shader_program_id, "u_scale")
-            previewRepeatLoc = glGetUniformLocation(self.shader_program_id, "u_previewRepeat")
-            mainViewScaleLoc = glGetUniformLocation(self.shader_program_id, "u_mainViewScale")
-            mainViewOffsetLoc = glGetUniformLocation(self.shader_program_id, "u_mainViewOffset")
-            useDirectX = glGetUniformLocation(self.shader_program_id, "u_useDirectX")
+            # --- 设置 Uniform（位置已在 init_shaders 中缓存） ---
+            uniforms = self.main_uniforms
+            baseMapLoc = uniforms["baseMap"]
+            hasBaseMapLoc = uniforms["u_hasBaseMap"]
+            flowMapLoc = uniforms["flowMap"]
+            timeLoc = uniforms["u_time"]
+            speedLoc = uniforms["u_flowSpeed"]
+            distLoc = uniforms["u_flowDistortion"]
+            baseScaleLoc = uniforms["u_scale"]
+            previewRepeatLoc = uniforms["u_previewRepeat"]
+            mainViewScaleLoc = uniforms["u_mainViewScale"]
+            mainViewOffsetLoc = uniforms["u_mainViewOffset"]
+            useDirectX = uniforms["u_useDirectX"]
 
             glActiveTexture(GL_TEXTURE0)
             base_tex_to_bind = self.base_texture_id if self.base_texture_id != 0 else 0
@@ -494,10 +809,10 @@ class FlowmapCanvas(QOpenGLWidget):
             if mainViewOffsetLoc != -1: glUniform2f(mainViewOffsetLoc, self.main_view_offset.x(), self.main_view_offset.y())
             if useDirectX != -1: glUniform1f(useDirectX, 1.0 if self.graphics_api_mode == "directx" else 0.0)
             # 传递cover纵横比校正
-            loc_as = glGetUniformLocation(self.shader_program_id, "u_aspectScale")
+            loc_as = uniforms["u_aspectScale"]
             if loc_as != -1:
                 glUniform2f(loc_as, float(self.aspect_scale_x), float(self.aspect_scale_y))
-            loc_ao = glGetUniformLocation(self.shader_program_id, "u_aspectOffset")
+            loc_ao = uniforms["u_aspectOffset"]
             if loc_ao != -1:
                 glUniform2f(loc_ao, float(self.aspect_offset_x), float(self.aspect_offset_y))
 
@@ -514,29 +829,32 @@ class FlowmapCanvas(QOpenGLWidget):
             glUseProgram(0)
 
         # Draw UV wire overlay (full-screen, over base/flowmap)
-        if getattr(self, 'uv_wire_enabled', False) and self.uv_wire_program != 0 and getattr(self, 'uv_wire_index_count', 0) > 0:
+        if (getattr(self, 'uv_wire_enabled', False) and self.uv_wire_program != 0
+                and getattr(self, 'uv_wire_index_count', 0) > 0
+                and float(getattr(self, 'uv_wire_opacity', 0.7)) >= MIN_VISIBLE_OPACITY):
             try:
                 glEnable(GL_BLEND)
                 glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
                 glViewport(0, 0, self.width(), self.height())
                 glUseProgram(self.uv_wire_program)
-                ms = glGetUniformLocation(self.uv_wire_program, "u_mainViewScale")
+                uniforms = self.uv_wire_uniforms
+                ms = uniforms["u_mainViewScale"]
                 if ms != -1:
                     glUniform1f(ms, self.main_view_scale)
-                mo = glGetUniformLocation(self.uv_wire_program, "u_mainViewOffset")
+                mo = uniforms["u_mainViewOffset"]
                 if mo != -1:
                     glUniform2f(mo, self.main_view_offset.x(), self.main_view_offset.y())
                 # 传递cover纵横比校正
-                loc_as = glGetUniformLocation(self.uv_wire_program, "u_aspectScale")
+                loc_as = uniforms["u_aspectScale"]
                 if loc_as != -1:
                     glUniform2f(loc_as, float(self.aspect_scale_x), float(self.aspect_scale_y))
-                loc_ao = glGetUniformLocation(self.uv_wire_program, "u_aspectOffset")
+                loc_ao = uniforms["u_aspectOffset"]
                 if loc_ao != -1:
                     glUniform2f(loc_ao, float(self.aspect_offset_x), float(self.aspect_offset_y))
-                col = glGetUniformLocation(self.uv_wire_program, "u_color")
+                col = uniforms["u_color"]
                 if col != -1:
                     glUniform3f(col, 0.95, 0.5, 0.1)
-                op = glGetUniformLocation(self.uv_wire_program, "u_opacity")
+                op = uniforms["u_opacity"]
                 if op != -1:
                     glUniform1f(op, float(getattr(self, 'uv_wire_opacity', 0.7)))
                 glBindVertexArray(self.uv_wire_vao)
@@ -550,7 +868,8 @@ class FlowmapCanvas(QOpenGLWidget):
                 glDisable(GL_BLEND)
 
         # draw overlay image (if any) over MAIN VIEW (full-screen), not the small preview
-        if self.has_overlay and self.overlay_texture_id != 0 and self.overlay_shader_program_id != 0:
+        if (self.has_overlay and self.overlay_texture_id != 0 and self.overlay_shader_program_id != 0
+                and float(self.overlay_opacity) >= MIN_VISIBLE_OPACITY):
             try:
                 glEnable(GL_BLEND)
                 glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
@@ -559,26 +878,27 @@ class FlowmapCanvas(QOpenGLWidget):
 
                 glActiveTexture(GL_TEXTURE0)
                 glBindTexture(GL_TEXTURE_2D, self.overlay_texture_id)
-                loc_tex = glGetUniformLocation(self.overlay_shader_program_id, "overlayMap")
+                uniforms = self.overlay_uniforms
+                loc_tex = uniforms["overlayMap"]
                 if loc_tex != -1:
                     glUniform1i(loc_tex, 0)
-                loc_op = glGetUniformLocation(self.overlay_shader_program_id, "u_opacity")
+                loc_op = uniforms["u_opacity"]
                 if loc_op != -1:
                     glUniform1f(loc_op, float(self.overlay_opacity))
-                loc_ms = glGetUniformLocation(self.overlay_shader_program_id, "u_mainViewScale")
+                loc_ms = uniforms["u_mainViewScale"]
                 if loc_ms != -1:
                     glUniform1f(loc_ms, self.main_view_scale)
-                loc_mo = glGetUniformLocation(self.overlay_shader_program_id, "u_mainViewOffset")
+                loc_mo = uniforms["u_mainViewOffset"]
                 if loc_mo != -1:
                     glUniform2f(loc_mo, self.main_view_offset.x(), self.main_view_offset.y())
-                loc_rep = glGetUniformLocation(self.overlay_shader_program_id, "u_repeat")
+                loc_rep = uniforms["u_repeat"]
                 if loc_rep != -1:
                     glUniform1i(loc_rep, 1 if self.preview_repeat else 0)
                 # 传递cover纵横比校正
-                loc_as = glGetUniformLocation(self.overlay_shader_program_id, "u_aspectScale")
+                loc_as = uniforms["u_aspectScale"]
                 if loc_as != -1:
                     glUniform2f(loc_as, float(self.aspect_scale_x), float(self.aspect_scale_y))
-                loc_ao = glGetUniformLocation(self.overlay_shader_program_id, "u_aspectOffset")
+                loc_ao = uniforms["u_aspectOffset"]
                 if loc_ao != -1:
                     glUniform2f(loc_ao, float(self.aspect_offset_x), float(self.aspect_offset_y))
 
@@ -605,13 +925,14 @@ class FlowmapCanvas(QOpenGLWidget):
 
             glActiveTexture(GL_TEXTURE0)
             glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id if self.flowmap_texture_id != 0 else 0)
-            loc_flow = glGetUniformLocation(self.preview_shader_program_id, "flowMap")
+            uniforms = self.preview_uniforms
+            loc_flow = uniforms["flowMap"]
             if loc_flow != -1:
                 glUniform1i(loc_flow, 0)
-            loc_off = glGetUniformLocation(self.preview_shader_program_id, "u_previewOffset")
+            loc_off = uniforms["u_previewOffset"]
             if loc_off != -1:
                 glUniform2f(loc_off, self.preview_offset.x(), self.preview_offset.y())
-            loc_rep = glGetUniformLocation(self.preview_shader_program_id, "u_previewRepeat")
+            loc_rep = uniforms["u_previewRepeat"]
             if loc_rep != -1:
                 glUniform1i(loc_rep, 1 if self.preview_repeat else 0)
 
@@ -713,7 +1034,7 @@ class FlowmapCanvas(QOpenGLWidget):
         self.target_main_view_scale = new_scale
         self.target_main_view_offset = new_offset
         self.scale_animation_active = True
-        self.scale_animation_start_time = time.time()
+        self.scale_animation_start_time = time.monotonic()
 
         self.update()  # 请求重绘
 
@@ -724,7 +1045,7 @@ class FlowmapCanvas(QOpenGLWidget):
             self.target_main_view_scale = 1.0
             self.target_main_view_offset = QPointF(0.0, 0.0)
             self.scale_animation_active = True
-            self.scale_animation_start_time = time.time()
+            self.scale_animation_start_time = time.monotonic()
             self.update()
         elif event.key() == Qt.Key_Shift:
             # 按下Shift键时激活模糊模式
@@ -833,10 +1154,11 @@ class FlowmapCanvas(QOpenGLWidget):
             self.mouse_state = MouseState.DRAWING
             self.is_drawing = True
             self.is_erasing = False
-            self.last_pos = event.pos()
+            # 笔刷使用浮点坐标，保留高分屏缩放下的亚像素位置
+            self.last_pos = event.localPos()
             # 发出绘制开始信号
             self.drawingStarted.emit()
-            self.apply_brush(event.pos(), event.pos())
+            self.apply_brush(self.last_pos, self.last_pos)
             self.update()
             # 在鼠标按下时不发出flowmap_updated信号，只在释放时发出
         elif event.button() == Qt.RightButton:  # 新增右键擦除功能
@@ -849,10 +1171,11 @@ class FlowmapCanvas(QOpenGLWidget):
             self.mouse_state = MouseState.ERASING
             self.is_drawing = True
             self.is_erasing = True
-            self.last_pos = event.pos()
+            # 笔刷使用浮点坐标，保留高分屏缩放下的亚像素位置
+            self.last_pos = event.localPos()
             # 发出绘制开始信号
             self.drawingStarted.emit()
-            self.apply_brush(event.pos(), event.pos())
+            self.apply_brush(self.last_pos, self.last_pos)
             self.update()
             # 在鼠标按下时不发出flowmap_updated信号，只在释放时发出
 
@@ -938,8 +1261,7 @@ class FlowmapCanvas(QOpenGLWidget):
 
         # 发送鼠标移动信号，用于更新画笔预览
         if not self.s_pressed:
-            pos = QPoint(event.pos().x(), event.pos().y())
-            self.mouse_moved.emit(pos)
+            self.mouse_moved.emit(event.pos())
 
         # 始终将鼠标位置传递给预览
         scene_pos = self.mapToScene(event.pos())
@@ -948,10 +1270,15 @@ class FlowmapCanvas(QOpenGLWidget):
         # 如果正在绘制且没有按下S键，则应用笔刷
         if not self.s_pressed and (self.mouse_state == MouseState.DRAWING or self.mouse_state == MouseState.ERASING) and \
            ((event.buttons() & Qt.LeftButton) or (event.buttons() & Qt.RightButton)):
-            current_pos = event.pos()
+            current_pos = event.localPos()
+
+            # 光标相对上次绘制点移动不足一个像素（高回报率设备常见）时直接跳过，
+            # 省去后续的坐标换算和笔刷计算；last_pos 保持不变，亚像素位移会累积到下一次绘制
+            if (current_pos - self.last_pos).manhattanLength() < 1.0:
+                return
 
             # 绘制节流控制 - 限制绘制频率以提高性能
-            current_time = time.time() * 1000  # 转换为毫秒
+            current_time = time.monotonic_ns() // 1000000  # 整数毫秒，节流判断全部为整数运算
             time_since_last_draw = current_time - self.last_draw_time
 
             if time_since_last_draw >= self.draw_throttle_ms:
@@ -961,42 +1288,42 @@ class FlowmapCanvas(QOpenGLWidget):
                 self.last_pos = current_pos
                 self.last_draw_time = current_time
 
-                # 如果有累积的位置，一并处理掉
-                if self.accumulated_positions:
-                    self.accumulated_positions = []
+                # 节流期间保存的位置已被这次绘制覆盖
+                self.pending_draw_pos = None
 
                 # 更新屏幕
                 self.update()
                 # 在鼠标移动过程中不发送flowmap_updated信号，减少信号数量
                 self.update_pending = False
             else:
-                # 累积鼠标位置，等待下次绘制
-                self.accumulated_positions.append(current_pos)
+                # 记录最新的鼠标位置，等待下次绘制（中间的位置由插值补齐，不需要保存）
+                self.pending_draw_pos = current_pos
 
                 # 如果还没有安排更新，则安排一个
                 if not self.update_pending:
                     self.update_pending = True
                     # 计算剩余等待时间
-                    remaining_time = max(1, int(self.draw_throttle_ms - time_since_last_draw))
+                    remaining_time = max(1, self.draw_throttle_ms - time_since_last_draw)
                     # 使用 singleShot 计时器在适当时间后触发更新
                     QTimer.singleShot(remaining_time, self.process_accumulated_positions)
 
     def process_accumulated_positions(self):
         """处理在节流期间累积的鼠标位置"""
-        if not self.accumulated_positions or (self.mouse_state != MouseState.DRAWING and self.mouse_state != MouseState.ERASING):
+        if self.pending_draw_pos is None or (self.mouse_state != MouseState.DRAWING and self.mouse_state != MouseState.ERASING):
             self.update_pending = False
             return
 
         # 取最近的点与上次绘制点之间绘制一条线
-        current_pos = self.accumulated_positions[-1]
+        current_pos = self.pending_draw_pos
+        self.pending_draw_pos = None
+        if (current_pos - self.last_pos).manhattanLength() < 1.0:
+            self.update_pending = False
+            return
 
         # 执行绘制
         self.apply_brush_with_interpolation(self.last_pos, current_pos)
         self.last_pos = current_pos
-        self.last_draw_time = time.time() * 1000
-
-        # 清除累积的位置
-        self.accumulated_positions = []
+        self.last_draw_time = time.monotonic_ns() // 1000000
 
         # 更新屏幕
         self.update()
@@ -1051,8 +1378,14 @@ class FlowmapCanvas(QOpenGLWidget):
         self.is_tablet_input = True
         
         # 获取笔压值 (0.0 - 1.0)
-        pressure = event.pressure()
-        self.current_pressure = max(0.01, pressure)  # 确保最小压力，避免完全无效果
+        if event.type() == QTabletEvent.TabletPress:
+            # 新的一笔不沿用上一笔的笔压历史
+            self.pressure_history = (0.0, 0.0)
+            self.pressure_spike_count = 0
+        pressure = self.filter_tablet_pressure(event.pressure())
+        pressure = max(0.01, pressure)  # 确保最小压力，避免完全无效果
+        pressure_changed = pressure != self.current_pressure
+        self.current_pressure = pressure
         
         # 根据笔压更新笔刷参数
         self.update_brush_from_pressure()
@@ -1064,24 +1397,26 @@ class FlowmapCanvas(QOpenGLWidget):
                 self.mouse_state = MouseState.DRAWING
                 self.is_drawing = True
                 self.is_erasing = False
-                self.last_pos = event.pos()
+                self.last_pos = event.posF()
                 self.drawingStarted.emit()
-                self.apply_brush(event.pos(), event.pos())
+                self.apply_brush(self.last_pos, self.last_pos)
                 self.update()
             elif event.button() == Qt.RightButton:
                 self.mouse_state = MouseState.ERASING
                 self.is_drawing = True
                 self.is_erasing = True
-                self.last_pos = event.pos()
+                self.last_pos = event.posF()
                 self.drawingStarted.emit()
-                self.apply_brush(event.pos(), event.pos())
+                self.apply_brush(self.last_pos, self.last_pos)
                 self.update()
                 
         elif event.type() == QTabletEvent.TabletMove:
-            # 数位板移动，继续绘制
-            if self.is_drawing:
-                self.apply_brush_with_interpolation(self.last_pos, event.pos())
-                self.last_pos = event.pos()
+            # 数位板移动，继续绘制；移动不足一个像素且笔压没有变化时跳过绘制，
+            # last_pos 保持不变，使用浮点坐标累积的亚像素位移不会丢失
+            current_pos = event.posF()
+            if self.is_drawing and ((current_pos - self.last_pos).manhattanLength() >= 1.0 or pressure_changed):
+                self.apply_brush_with_interpolation(self.last_pos, current_pos)
+                self.last_pos = current_pos
                 self.update()
                 
         elif event.type() == QTabletEvent.TabletRelease:
@@ -1096,6 +1431,22 @@ class FlowmapCanvas(QOpenGLWidget):
         # 接受事件，防止传递给鼠标事件处理
         event.accept()
     
+    def filter_tablet_pressure(self, pressure):
+        """过滤数位板偶发的笔压突变
+
+        部分数位板驱动会在绘制过程中随机上报 1~2 帧 pressure == 1.0，直接使用会画出
+        一个过大、过强的笔刷点。前一次笔压在 (0, 1) 之间时出现的 1.0 按前两次笔压线性外推；
+        连续超过两帧仍为 1.0 时视为真实的满压力。
+        """
+        prev, prev_prev = self.pressure_history
+        if pressure >= 1.0 and 0.0 < prev < 1.0 and self.pressure_spike_count < 2:
+            self.pressure_spike_count += 1
+            pressure = min(1.0, max(0.0, 2.0 * prev - prev_prev))
+        else:
+            self.pressure_spike_count = 0
+        self.pressure_history = (pressure, prev)
+        return pressure
+
     def update_brush_from_pressure(self):
         """根据当前笔压更新笔刷参数"""
         # 只在数位板输入模式下影响大小
@@ -1122,7 +1473,7 @@ class FlowmapCanvas(QOpenGLWidget):
         # 计算两点间的距离
         dx = current_widget_pos.x() - last_widget_pos.x()
         dy = current_widget_pos.y() - last_widget_pos.y()
-        distance = np.sqrt(dx*dx + dy*dy)
+        distance = math.hypot(dx, dy)
         
         # 根据笔刷半径确定插值步长
         # 步长约为笔刷半径的一半，确保有足够的重叠
@@ -1134,28 +1485,22 @@ class FlowmapCanvas(QOpenGLWidget):
             return
         
         # 计算需要插值的点数
-        num_steps = int(np.ceil(distance / step_size))
+        num_steps = math.ceil(distance / step_size)
         
         # 进行线性插值绘制
+        start_x = last_widget_pos.x()
+        start_y = last_widget_pos.y()
+        # 每个插值点的前一个点（用于流向计算）就是上一次循环的插值点
+        prev_pos = last_widget_pos
         for i in range(num_steps + 1):
-            t = i / num_steps if num_steps > 0 else 0
-            
-            # 线性插值计算当前点
-            interp_x = last_widget_pos.x() + dx * t
-            interp_y = last_widget_pos.y() + dy * t
-            interp_pos = QPoint(int(interp_x), int(interp_y))
+            t = i / num_steps
             
-            # 为每个插值点计算前一个点（用于流向计算）
-            if i == 0:
-                prev_pos = last_widget_pos
-            else:
-                prev_t = (i - 1) / num_steps if num_steps > 0 else 0
-                prev_x = last_widget_pos.x() + dx * prev_t
-                prev_y = last_widget_pos.y() + dy * prev_t
-                prev_pos = QPoint(int(prev_x), int(prev_y))
+            # 线性插值计算当前点，保留浮点坐标，到换算纹理像素时才取整
+            interp_pos = QPointF(start_x + dx * t, start_y + dy * t)
             
             # 绘制插值点
             self.apply_brush(prev_pos, interp_pos, explicit_flow_dir)
+            prev_pos = interp_pos
 
     def apply_brush(self, last_widget_pos, current_widget_pos, explicit_flow_dir=None):
         """
@@ -1177,31 +1522,26 @@ class FlowmapCanvas(QOpenGLWidget):
         if tex_w <= 0 or tex_h <= 0: return
 
         # 将窗口坐标转换为场景坐标（纹理空间）
-        last_pos_scene = self.mapToScene(last_widget_pos)
-        current_pos_scene = self.mapToScene(current_widget_pos)
+        last_scene_x, last_scene_y = self._map_to_scene_xy(last_widget_pos.x(), last_widget_pos.y())
+        scene_x, scene_y = self._map_to_scene_xy(current_widget_pos.x(), current_widget_pos.y())
 
         # 允许在预览区域上绘制（仅在中键拖拽时才进入预览拖动逻辑）
 
         # 四方连续模式下，对坐标取模确保在[0,1]范围内
         if self.enable_seamless:
             # 使用取模操作处理坐标，确保它们落在[0,1]范围内
-            current_pos_scene = QPointF(
-                current_pos_scene.x() - np.floor(current_pos_scene.x()),
-                current_pos_scene.y() - np.floor(current_pos_scene.y())
-            )
-            last_pos_scene = QPointF(
-                last_pos_scene.x() - np.floor(last_pos_scene.x()),
-                last_pos_scene.y() - np.floor(last_pos_scene.y())
-            )
+            scene_x -= math.floor(scene_x)
+            scene_y -= math.floor(scene_y)
+            last_scene_x -= math.floor(last_scene_x)
+            last_scene_y -= math.floor(last_scene_y)
         # 非四方连续模式下，检查是否超出有效范围
-        elif (current_pos_scene.x() < 0 or current_pos_scene.x() > 1.0 or
-              current_pos_scene.y() < 0 or current_pos_scene.y() > 1.0):
+        elif scene_x < 0 or scene_x > 1.0 or scene_y < 0 or scene_y > 1.0:
             return  # 不绘制超出纹理范围的部分
 
         # 转换到纹理像素坐标
         # shader 和 OpenGL 纹理都使用左上角为原点(0,0)的坐标系
-        center_x_tex = int(current_pos_scene.x() * tex_w)
-        center_y_tex = int(current_pos_scene.y() * tex_h)  # 不需要翻转，因为 shader 使用的是 Y 轴向下的坐标系
+        center_x_tex = int(scene_x * tex_w)
+        center_y_tex = int(scene_y * tex_h)  # 不需要翻转，因为 shader 使用的是 Y 轴向下的坐标系
 
         # 计算流向向量
         if explicit_flow_dir is not None:
@@ -1212,24 +1552,21 @@ class FlowmapCanvas(QOpenGLWidget):
             flow_y = -explicit_flow_dir[1]  # Y轴保持原有的负号约定
         else:
             # 传统方式：基于两点间的差值计算
-            delta_x_scene = current_pos_scene.x() - last_pos_scene.x()
-            delta_y_scene = current_pos_scene.y() - last_pos_scene.y()
+            delta_x_scene = scene_x - last_scene_x
+            delta_y_scene = scene_y - last_scene_y
 
             # 四方连续模式下处理跨边界的情况（例如从右边缘到左边缘）
+            # 差值减去最近的整数即为周期坐标下的最短差值，绝对值大于0.5时表示跨越了边界
             if self.enable_seamless:
-                # 如果横向差值大于0.5，表示跨越了水平边界
-                if abs(delta_x_scene) > 0.5:
-                    delta_x_scene = -np.sign(delta_x_scene) * (1.0 - abs(delta_x_scene))
-                # 如果纵向差值大于0.5，表示跨越了垂直边界
-                if abs(delta_y_scene) > 0.5:
-                    delta_y_scene = -np.sign(delta_y_scene) * (1.0 - abs(delta_y_scene))
+                delta_x_scene -= round(delta_x_scene)
+                delta_y_scene -= round(delta_y_scene)
 
             # 计算流向在纹理空间的大小
             flow_x = delta_x_scene * tex_w   # 修改：向右移动表示材质向右流动（默认反转R通道）
             flow_y = -delta_y_scene * tex_h  # 修改：使用负号确保 Y 轴方向一致
 
         # 测试输出当前位置和转换后的纹理坐标，用于调试
-        # print(f"Scene: ({current_pos_scene.x():.3f}, {current_pos_scene.y():.3f}) -> Texture: ({center_x_tex}, {center_y_tex})")
+        # print(f"Scene: ({scene_x:.3f}, {scene_y:.3f}) -> Texture: ({center_x_tex}, {center_y_tex})")
         # print(f"Flow vector: ({flow_x:.3f}, {flow_y:.3f})")
 
         # 检查是否处于模糊模式（按住Shift键）
@@ -1257,7 +1594,7 @@ class FlowmapCanvas(QOpenGLWidget):
                 else:
                     # 根据移动速度调整current_pressure
                     # 计算原始速度因子 (0-1)
-                    raw_speed_factor = min(1.0, np.sqrt(length_sq) / 100.0)
+                    raw_speed_factor = min(1.0, math.sqrt(length_sq) / 100.0)
                     
                     # 修正速度感应逻辑：快速绘制时压力大，慢速绘制时压力小
                     if self.speed_sensitivity < 0.01:  # 接近0时，固定压力
@@ -1277,7 +1614,7 @@ class FlowmapCanvas(QOpenGLWidget):
             else:
 
                 # 标准化流向向量
-                length = np.sqrt(length_sq)
+                length = math.sqrt(length_sq)
                 if length > 1e-8:  # 避免除零错误
                     flow_x /= length
                     flow_y /= length
@@ -1293,8 +1630,9 @@ class FlowmapCanvas(QOpenGLWidget):
                 flow_color_g = 0.5
             else:
                 # 正常绘制模式：根据流向方向计算颜色
-                flow_color_r = np.clip((flow_x + 1.0) * 0.5, 0.0, 1.0)
-                flow_color_g = np.clip((flow_y + 1.0) * 0.5, 0.0, 1.0)
+                # 流向已标准化为单位向量（或上面的默认方向），颜色必然落在 [0, 1] 内，无需截断
+                flow_color_r = (flow_x + 1.0) * 0.5
+                flow_color_g = (flow_y + 1.0) * 0.5
         else:
             # 模糊模式：强度决定模糊程度（使用当前笔刷强度）
             # 模糊模式下不设置特定的流向颜色，而是通过对周围像素进行平均来实现模糊
@@ -1302,7 +1640,7 @@ class FlowmapCanvas(QOpenGLWidget):
             flow_color_g = 0.0  # 这个值会在模糊处理中被忽略
 
         # 输出调试信息 - 启用调试信息，帮助理解坐标映射
-        # print(f"Widget pos: ({current_widget_pos.x()}, {current_widget_pos.y()}) -> Scene: ({current_pos_scene.x():.3f}, {current_pos_scene.y():.3f})")
+        # print(f"Widget pos: ({current_widget_pos.x()}, {current_widget_pos.y()}) -> Scene: ({scene_x:.3f}, {scene_y:.3f})")
         # print(f"Center tex: ({center_x_tex}, {center_y_tex}), Flow: ({flow_x:.2f}, {flow_y:.2f}) -> Color: ({flow_color_r:.2f}, {flow_color_g:.2f})")
 
         # 计算笔刷影响区域
@@ -1338,7 +1676,11 @@ class FlowmapCanvas(QOpenGLWidget):
         # 局部修改区域列表，用于跟踪需要更新的纹理区域
         modified_regions = []
 
-        # 使用try-finally确保纹理始终被正确解绑
+        # 优先在 GPU 上直接绘制到 flowmap 纹理：笔刷点先加入队列，
+        # 在下一帧开始时统一绘制，一帧内的多个事件只需设置一次绘制状态
+        use_gpu = self.is_gpu_brush_available()
+        self.gpu_brush_queueing = use_gpu
+
         try:
             # 应用主笔刷效果
             self.apply_brush_effect_optimized(min_x, max_x, min_y, max_y, center_x_tex, center_y_tex,
@@ -1350,55 +1692,74 @@ class FlowmapCanvas(QOpenGLWidget):
                 seamless_regions = self.apply_seamless_brush_all_directions_optimized(center_x_tex, center_y_tex, radius_tex,
                                                 flow_color_r, flow_color_g, self.brush_strength)
                 modified_regions.extend(seamless_regions)
+        except Exception as e:
+             print(f"Error during brush application: {e}")
+        finally:
+             self.gpu_brush_queueing = False
+             if not use_gpu:
+                  # 纹理上传推迟到下一帧的 paintGL 中统一进行
+                  for x, y, width, height in modified_regions:
+                       self.mark_dirty_region(x, y, width, height)
+             self.update()
+
+    def mark_dirty_region(self, x, y, width, height):
+        """记录一个需要上传到 GPU 的修改区域
+
+        新区域与已有区域的包围盒面积不超过两者面积之和的两倍时直接合并，
+        因此同一帧内连续的笔刷点会合并成少数几个矩形；分布在对角的四方连续
+        镜像区域则保持独立，避免上传大量未修改的像素。
+        """
+        if width <= 0 or height <= 0:
+            return
 
-            # 更新GPU上的纹理数据
-            if self.flowmap_texture_id == 0:
-                print("Error: Flowmap texture not initialized.")
+        max_x = x + width
+        max_y = y + height
+        area = width * height
+        for region in self.pending_dirty_regions:
+            union_min_x = min(region[0], x)
+            union_min_y = min(region[1], y)
+            union_max_x = max(region[2], max_x)
+            union_max_y = max(region[3], max_y)
+            union_area = (union_max_x - union_min_x) * (union_max_y - union_min_y)
+            if union_area <= 2 * (region[4] + area):
+                region[:] = [union_min_x, union_min_y, union_max_x, union_max_y, region[4] + area]
                 return
+        self.pending_dirty_regions.append([x, y, max_x, max_y, area])
 
-            glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id)
+    def flush_dirty_regions(self):
+        """将自上一帧以来累积的修改区域上传到 flowmap 纹理
 
-            # 使用部分纹理更新而不是更新整个纹理
-            if len(modified_regions) <= 3:  # 少量区域时使用局部更新
-                for region in modified_regions:
-                    x, y, width, height = region
-                    # 确保有效范围
-                    if width <= 0 or height <= 0:
-                        continue
-
-                    # 确保数据连续存储
-                    update_data = self.flowmap_data[y:y+height, x:x+width]
-                    if not update_data.flags['C_CONTIGUOUS']:
-                        update_data = np.ascontiguousarray(update_data)
-
-                    # 局部更新纹理
-                    glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height,
-                                  GL_RGBA, GL_FLOAT, update_data)
-            else:
-                # 区域过多时更新整个纹理更高效
-                # 确保数据连续存储
-                if not self.flowmap_data.flags['C_CONTIGUOUS']:
-                    update_data = np.ascontiguousarray(self.flowmap_data)
-                else:
-                    update_data = self.flowmap_data
+        在 paintGL 开始时调用，无论这一帧内处理了多少鼠标事件，每帧最多上传一次。
+        """
+        if not self.pending_dirty_regions or self.flowmap_texture_id == 0:
+            return
 
-                # 更新整个纹理
-                glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, tex_w, tex_h,
-                              GL_RGBA, GL_FLOAT, update_data)
+        regions = self.pending_dirty_regions
+        self.pending_dirty_regions = []
 
+        try:
+            glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id)
+
+            # 相邻的区域在 mark_dirty_region 中已经合并，剩下的区域彼此相距较远
+            # （例如四方连续时分布在四个角落的镜像），逐个局部上传，不再退回整张纹理
+            for min_x, min_y, max_x, max_y, _ in regions:
+                # 局部更新纹理（经由 PBO 环形缓冲）
+                self.upload_flowmap_region(min_x, min_y, max_x - min_x, max_y - min_y)
         except GLError as e:
-             print(f"OpenGL Error during glTexSubImage2D: {e}")
-        except Exception as e:
-             print(f"Error during brush application: {e}")
+            print(f"OpenGL Error during flowmap upload: {e}")
         finally:
-             # 确保纹理解绑
-             if self.flowmap_texture_id != 0:
-                  glBindTexture(GL_TEXTURE_2D, 0)
+            glBindTexture(GL_TEXTURE_2D, 0)
 
-    def apply_brush_effect_optimized(self, min_x, max_x, min_y, max_y, center_x, center_y, radius, flow_r, flow_g, strength):
+    def apply_brush_effect_optimized(self, min_x, max_x, min_y, max_y, center_x, center_y, radius, flow_r, flow_g, strength,
+                                     blur=None):
         """
         优化版本的笔刷应用函数，使用向量化和预计算
+
+        blur 为 None 时根据当前是否按住 Shift 决定是否为模糊模式
         """
+        if blur is None:
+            blur = self.shift_pressed
+
         # 防御性检查，确保坐标有效
         if min_x >= max_x or min_y >= max_y:
             return
@@ -1407,76 +1768,312 @@ class FlowmapCanvas(QOpenGLWidget):
         if tex_w <= 0 or tex_h <= 0 or min_x < 0 or min_y < 0 or max_x > tex_w or max_y > tex_h:
             return
 
+        # 把影响区域收缩到衰减系数不可忽略的范围，只覆盖笔刷边缘的区域（常见于四方连续的镜像）直接跳过
+        center_x_int = int(round(center_x))
+        center_y_int = int(round(center_y))
+        if blur:
+            # 模糊的采样窗口受影响区域限制，这里只判断是否存在需要模糊的像素，不收缩区域
+            active_half = self.brush_data.get_active_half_size(radius, BLUR_FALLOFF_THRESHOLD)
+            if (max(min_x, center_x_int - active_half) >= min(max_x, center_x_int + active_half + 1) or
+                    max(min_y, center_y_int - active_half) >= min(max_y, center_y_int + active_half + 1)):
+                return
+        else:
+            active_half = self.brush_data.get_active_half_size(radius, FALLOFF_EPSILON)
+            min_x = max(min_x, center_x_int - active_half)
+            max_x = min(max_x, center_x_int + active_half + 1)
+            min_y = max(min_y, center_y_int - active_half)
+            max_y = min(max_y, center_y_int + active_half + 1)
+            if min_x >= max_x or min_y >= max_y:
+                return
+
+        # GPU 笔刷：记录笔刷点，在下一帧开始时统一绘制到 flowmap 纹理
+        if self.gpu_brush_queueing:
+            self.pending_gpu_dabs.append((min_x, max_x, min_y, max_y, center_x, center_y,
+                                          radius, flow_r, flow_g, strength, blur))
+            return
+
         # 提取子区域进行处理 - 使用视图而不是复制以提高性能
         sub_region = self.flowmap_data[min_y:max_y, min_x:max_x]
 
         # 区域的高度和宽度
         h, w = sub_region.shape[0], sub_region.shape[1]
 
-        # 1. 创建笔刷强度矩阵和距离场
+        # 1. 从预计算的衰减系数表中截取与影响区域对应的窗口
+        # 半径不变时所有笔刷点共用同一张表，避免每次重新计算距离场
+        falloff_lut, lut_half = self.brush_data.get_falloff_lut(radius)
+        lut_x = int(round(min_x - center_x)) + lut_half
+        lut_y = int(round(min_y - center_y)) + lut_half
+        falloff = falloff_lut[lut_y:lut_y + h, lut_x:lut_x + w]
+        if blur:
+            blur_mask = self.brush_data.get_blur_mask(radius)[lut_y:lut_y + h, lut_x:lut_x + w]
+
+        # 笔刷参数统一为 float32，避免与 float64 标量/数组运算时整块提升为 float64
+        strength = np.float32(strength)
+        flow_r = np.float32(flow_r)
+        flow_g = np.float32(flow_g)
+
+        if brush_kernels.is_available():
+            try:
+                if blur:
+                    # 模糊模式 - 使用编译后的内核进行局部平均，采样半径为笔刷半径的20%
+                    brush_kernels.blur_blend(sub_region, falloff, blur_mask, strength,
+                                             max(1, int(radius * 0.2)))
+                else:
+                    # 2. 正常绘制模式 - 使用编译后的内核逐像素混合，不产生临时数组
+                    brush_kernels.paint_blend(sub_region, falloff, strength, flow_r, flow_g)
+                return
+            except Exception as e:
+                # 内核在编译阶段失败，尚未修改数据，改用下面的 NumPy 实现；
+                # 禁用后不会再进入这里，错误只输出一次
+                print(f"Warning: numba brush kernel failed, CPU brush falls back to NumPy: {e}")
+                brush_kernels.disable(e)
+
+        # 检查是否处于模糊模式
+        if blur:
+            # 模糊模式 - 用积分图计算每个像素采样窗口内的平均值，采样半径为笔刷半径的20%
+            # 窗口限制在子区域内；积分图用 float64 累加，整个计算与窗口大小无关
+            sample_radius = max(1, int(radius * 0.2))
+            sums = np.zeros((h + 1, w + 1, 2), dtype=np.float64)
+            np.cumsum(np.cumsum(sub_region, axis=0, dtype=np.float64), axis=1, out=sums[1:, 1:])
+
+            # 只处理受影响的像素，包围盒四角等衰减可忽略的像素直接跳过
+            ys, xs = np.nonzero(blur_mask)
+            y0 = np.maximum(ys - sample_radius, 0)
+            y1 = np.minimum(ys + sample_radius + 1, h)
+            x0 = np.maximum(xs - sample_radius, 0)
+            x1 = np.minimum(xs + sample_radius + 1, w)
+            window_sum = sums[y1, x1] - sums[y0, x1] - sums[y1, x0] + sums[y0, x0]
+            avg_color = window_sum / ((y1 - y0) * (x1 - x0))[:, None]
+
+            # 根据强度渐进地应用模糊效果
+            blend_factor = (falloff[ys, xs] * strength)[:, None]
+            sub_region[ys, xs] = sub_region[ys, xs] * (1 - blend_factor) + avg_color * blend_factor
+        else:
+            # 将强度矩阵限制在笔刷半径内
+            strength_mask = falloff * strength
+
+            # 2. 正常绘制模式 - 应用笔刷颜色
+            # 使用线性混合公式: result = original * (1 - alpha) + new_color * alpha
+            # 其中alpha是强度掩码；颜色以标量参与运算，逐通道原地写回，不再创建整块颜色数组
+            keep_mask = 1 - strength_mask
+            for channel, color in ((0, flow_r), (1, flow_g)):
+                channel_view = sub_region[:, :, channel]
+                channel_view *= keep_mask
+                channel_view += color * strength_mask
+
+    def warm_up_brush_kernels(self):
+        """编译（或从缓存加载）CPU 笔刷内核，失败时输出一次原因，之后 CPU 笔刷使用 NumPy 实现"""
+        if brush_kernels.is_available() and not brush_kernels.warm_up():
+            print(f"Warning: numba brush kernels failed to compile, CPU brush uses NumPy: "
+                  f"{brush_kernels.get_import_error()}")
+
+    def is_gpu_brush_available(self):
+        """GPU 笔刷所需的着色器、纹理和 VAO 是否都已就绪"""
+        return (self.gpu_brush_enabled and self.brush_shader_program_id != 0
+                and self.flowmap_texture_id != 0 and self.vao != 0)
+
+    def flush_gpu_dabs(self, release_context=True):
+        """把队列中的笔刷点绘制到 flowmap 纹理
+
+        在每帧开始时以及读取 flowmap 之前调用，一帧内累积的所有笔刷点只设置一次绘制状态。
+        在 paintGL 中调用时 release_context 应为 False，保持上下文有效。
+        """
+        if not self.pending_gpu_dabs:
+            return
 
-        # 计算 y, x 网格的坐标点
-        y_indices, x_indices = np.ogrid[:h, :w]
+        dabs = self.pending_gpu_dabs
+        self.pending_gpu_dabs = []
 
-        # 调整为相对于笔刷中心的坐标
-        y_coords = y_indices + min_y - center_y
-        x_coords = x_indices + min_x - center_x
+        if self.begin_gpu_brush(release_context):
+            try:
+                for dab in dabs:
+                    self.apply_brush_effect_gpu(*dab)
+            except Exception as e:
+                print(f"Error during GPU brush application: {e}")
+            finally:
+                self.end_gpu_brush(release_context)
+            return
 
-        # 计算距离的平方 (距离场)
-        dist_sq = x_coords**2 + y_coords**2
+        # GPU 笔刷不可用（例如 FBO 不完整）时改用 CPU 绘制，结果随下一帧上传。
+        # 本次笔画中之前的笔刷点可能已经画进纹理，先读回 flowmap_data，
+        # 否则上传时会用旧数据覆盖这些笔刷点
+        self.sync_flowmap_from_gpu()
+        for min_x, max_x, min_y, max_y, center_x, center_y, radius, flow_r, flow_g, strength, blur in dabs:
+            self.apply_brush_effect_optimized(min_x, max_x, min_y, max_y, center_x, center_y,
+                                              radius, flow_r, flow_g, strength, blur)
+            self.mark_dirty_region(min_x, min_y, max_x - min_x, max_y - min_y)
 
-        # 应用平滑的回落(falloff)函数 - 使用二次函数使边缘更平滑
-        radius_sq = radius**2
-        # 将距离转换为 0-1 范围的回落值，超出半径的部分为0
-        falloff = np.maximum(0, 1.0 - dist_sq / radius_sq)
-        # 使用平方来让衰减更加平滑
-        falloff = falloff**2
+    def begin_gpu_brush(self, release_context=True):
+        """准备以 flowmap 纹理为渲染目标绘制笔刷
 
-        # 将强度矩阵限制在笔刷半径内
-        strength_mask = falloff * strength
+        返回 True 后可以调用 apply_brush_effect_gpu 绘制笔刷点，
+        结束后必须调用 end_gpu_brush 恢复状态。GPU 笔刷不可用时返回 False。
+        """
+        if not self.is_gpu_brush_available():
+            return False
 
-        # 检查是否处于模糊模式
-        if self.shift_pressed:
-            # 模糊模式 - 进行局部平均
-            # 为每个像素创建一个模糊核心，基于距离场和强度
-            blur_result = np.zeros_like(sub_region[:,:,:2])  # 只需处理RG通道
-
-            # 对每个受影响的像素，计算周围像素的加权平均
-            # 这是一个简化的实现，实际上可以使用高斯模糊或其他更高效的算法
-            for y in range(h):
-                for x in range(w):
-                    if falloff[y, x] > 0.01:  # 只处理受影响的像素
-                        # 定义一个小的采样窗口
-                        sample_radius = max(1, int(radius * 0.2))  # 采样半径为笔刷半径的20%
-                        sample_min_y = max(0, y - sample_radius)
-                        sample_max_y = min(h, y + sample_radius + 1)
-                        sample_min_x = max(0, x - sample_radius)
-                        sample_max_x = min(w, x + sample_radius + 1)
-
-                        # 提取采样窗口
-                        sample_window = sub_region[sample_min_y:sample_max_y, sample_min_x:sample_max_x, :2]
-
-                        # 计算加权平均
-                        if sample_window.size > 0:  # 确保窗口不为空
-                            avg_color = np.mean(sample_window, axis=(0, 1))
-                            current_color = sub_region[y, x, :2]
-                            # 根据强度渐进地应用模糊效果
-                            blend_factor = strength_mask[y, x]
-                            blur_result[y, x] = current_color * (1 - blend_factor) + avg_color * blend_factor
-
-            # 应用模糊结果到子区域
-            sub_region[:, :, 0] = np.where(falloff[:, :] > 0.01, blur_result[:, :, 0], sub_region[:, :, 0])
-            sub_region[:, :, 1] = np.where(falloff[:, :] > 0.01, blur_result[:, :, 1], sub_region[:, :, 1])
+        try:
+            self.makeCurrent()
+
+            # 先提交 CPU 端尚未上传的修改，保证在最新的纹理上绘制
+            self.flush_dirty_regions()
+
+            if self.brush_fbo == 0:
+                self.brush_fbo = glGenFramebuffers(1)
+            glBindFramebuffer(GL_FRAMEBUFFER, self.brush_fbo)
+
+            if self.brush_fbo_texture_id != self.flowmap_texture_id:
+                glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D,
+                                       self.flowmap_texture_id, 0)
+                status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+                if status != GL_FRAMEBUFFER_COMPLETE:
+                    print(f"Brush framebuffer incomplete ({status}), falling back to CPU brush")
+                    self.gpu_brush_enabled = False
+                    glBindFramebuffer(GL_FRAMEBUFFER, self.defaultFramebufferObject())
+                    if release_context:
+                        self.doneCurrent()
+                    return False
+                self.brush_fbo_texture_id = self.flowmap_texture_id
+
+            glUseProgram(self.brush_shader_program_id)
+            glBindVertexArray(self.vao)
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+            self.gpu_brush_active = True
+            return True
+        except GLError as e:
+            print(f"OpenGL error preparing GPU brush, falling back to CPU brush: {e}")
+            self.gpu_brush_enabled = False
+            self.end_gpu_brush(release_context)
+            return False
+
+    def end_gpu_brush(self, release_context=True):
+        """结束 GPU 笔刷绘制，恢复 OpenGL 状态，release_context 为 True 时释放上下文"""
+        self.gpu_brush_active = False
+        try:
+            glDisable(GL_BLEND)
+            glBindVertexArray(0)
+            glUseProgram(0)
+            glActiveTexture(GL_TEXTURE0)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            glBindFramebuffer(GL_FRAMEBUFFER, self.defaultFramebufferObject())
+        except GLError as e:
+            print(f"OpenGL error finishing GPU brush: {e}")
+        finally:
+            if release_context:
+                self.doneCurrent()
+
+    def apply_brush_effect_gpu(self, min_x, max_x, min_y, max_y, center_x, center_y, radius, flow_r, flow_g, strength, blur):
+        """在 GPU 上绘制一个笔刷点，参数与 apply_brush_effect_optimized 相同
+
+        视口设置为影响区域，绘制一个覆盖视口的四边形，由 brush_shader 计算衰减并混合。
+        模糊模式先把影响区域复制到临时纹理，再从副本中采样求平均。
+        """
+        width = max_x - min_x
+        height = max_y - min_y
+        uniforms = self.brush_uniforms
+
+        glUniform2f(uniforms["u_center"], float(center_x), float(center_y))
+        glUniform1f(uniforms["u_radius"], float(radius))
+        glUniform2f(uniforms["u_flowColor"], float(flow_r), float(flow_g))
+        glUniform1f(uniforms["u_strength"], float(strength))
+        glUniform1i(uniforms["u_blur"], 1 if blur else 0)
+
+        if blur:
+            # 复制影响区域作为模糊的采样源（不能同时读写同一纹理）
+            scratch_w, scratch_h = self.brush_scratch_size
+            glActiveTexture(GL_TEXTURE0)
+            if self.brush_scratch_texture_id == 0 or width > scratch_w or height > scratch_h:
+                if self.brush_scratch_texture_id == 0:
+                    self.brush_scratch_texture_id = glGenTextures(1)
+                scratch_w = max(width, scratch_w)
+                scratch_h = max(height, scratch_h)
+                glBindTexture(GL_TEXTURE_2D, self.brush_scratch_texture_id)
+                glTexImage2D(GL_TEXTURE_2D, 0, GL_RG16F, scratch_w, scratch_h, 0, GL_RG, GL_HALF_FLOAT, None)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+                self.brush_scratch_size = (scratch_w, scratch_h)
+            else:
+                glBindTexture(GL_TEXTURE_2D, self.brush_scratch_texture_id)
+            glCopyTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, min_x, min_y, width, height)
+
+            glUniform1i(uniforms["u_source"], 0)
+            glUniform2i(uniforms["u_regionMin"], min_x, min_y)
+            glUniform2i(uniforms["u_regionSize"], width, height)
+            glUniform1i(uniforms["u_sampleRadius"], max(1, int(radius * 0.2)))
+
+        glViewport(min_x, min_y, width, height)
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
+
+        # 记录尚未读回的区域，同步时只读回这部分
+        rect = self.gpu_dirty_rect
+        if not self.flowmap_gpu_dirty or rect is None:
+            self.gpu_dirty_rect = [min_x, min_y, max_x, max_y]
         else:
-            # 2. 正常绘制模式 - 应用笔刷颜色
-            # 将颜色值整形为与子区域匹配的形状，以便进行向量化操作
-            flow_r_array = np.full((h, w), flow_r)
-            flow_g_array = np.full((h, w), flow_g)
+            rect[0] = min(rect[0], min_x)
+            rect[1] = min(rect[1], min_y)
+            rect[2] = max(rect[2], max_x)
+            rect[3] = max(rect[3], max_y)
+        self.flowmap_gpu_dirty = True
 
-            # 使用线性混合公式: result = original * (1 - alpha) + new_color * alpha
-            # 其中alpha是强度掩码
-            sub_region[:, :, 0] = sub_region[:, :, 0] * (1 - strength_mask) + flow_r_array * strength_mask
-            sub_region[:, :, 1] = sub_region[:, :, 1] * (1 - strength_mask) + flow_g_array * strength_mask
+    def sync_flowmap_from_gpu(self):
+        """将 GPU 笔刷的绘制结果读回 flowmap_data
+
+        撤销快照、导出和预览等操作依赖 CPU 端的数据，在使用前调用即可；
+        没有未同步的修改时直接返回。
+        """
+        # 先绘制队列中尚未绘制的笔刷点
+        self.flush_gpu_dabs()
+        if not self.flowmap_gpu_dirty or self.flowmap_texture_id == 0:
+            return
+
+        try:
+            self.makeCurrent()
+            width, height = self.texture_size
+            glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id)
+            glPixelStorei(GL_PACK_ALIGNMENT, 4)
+            # PyOpenGL 的 glGetTexImage / glReadPixels 封装不支持 GL_RG，直接读入 flowmap_data 的内存
+            if (self.flowmap_data is None or self.flowmap_data.shape != (height, width, 2)
+                    or not self.flowmap_data.flags['C_CONTIGUOUS']):
+                self.flowmap_data = np.empty((height, width, 2), dtype=np.float32)
+                self.gpu_dirty_rect = None
+
+            rect = self.gpu_dirty_rect
+            if (rect is not None and self.brush_fbo != 0
+                    and self.brush_fbo_texture_id == self.flowmap_texture_id
+                    and (rect[2] - rect[0]) * (rect[3] - rect[1]) < width * height):
+                # 只读回笔刷修改过的区域：从绑定了 flowmap 纹理的笔刷 FBO 中读取，
+                # 按整行跨度直接写入 flowmap_data 中对应的位置
+                min_x, min_y, max_x, max_y = rect
+                offset = (min_y * width + min_x) * self.flowmap_data.itemsize * 2
+                glBindFramebuffer(GL_READ_FRAMEBUFFER, self.brush_fbo)
+                glReadBuffer(GL_COLOR_ATTACHMENT0)
+                glPixelStorei(GL_PACK_ROW_LENGTH, width)
+                try:
+                    glReadPixelsRaw(min_x, min_y, max_x - min_x, max_y - min_y, GL_RG, GL_FLOAT,
+                                    ctypes.c_void_p(self.flowmap_data.ctypes.data + offset))
+                finally:
+                    glPixelStorei(GL_PACK_ROW_LENGTH, 0)
+                    glBindFramebuffer(GL_READ_FRAMEBUFFER, self.defaultFramebufferObject())
+            else:
+                glGetTexImageRaw(GL_TEXTURE_2D, 0, GL_RG, GL_FLOAT,
+                                 self.flowmap_data.ctypes.data_as(ctypes.c_void_p))
+            self.flowmap_gpu_dirty = False
+            self.gpu_dirty_rect = None
+        except GLError as e:
+            print(f"OpenGL error reading back flowmap: {e}")
+        finally:
+            glBindTexture(GL_TEXTURE_2D, 0)
+            self.doneCurrent()
+
+    @staticmethod
+    def get_seamless_offsets(center, radius, size):
+        """返回笔刷在一个轴上与纹理 [0, size) 相交的所有周期平移量（包含 0）"""
+        # 平移 k * size 后笔刷覆盖 [center + k*size - radius, center + k*size + radius]，
+        # 与纹理相交要求右端 >= 0 且左端 < size
+        k_min = math.ceil((-radius - center) / size)
+        k_max = math.ceil((size + radius - center) / size) - 1
+        return range(k_min * size, (k_max + 1) * size, size)
 
     def apply_seamless_brush_all_directions_optimized(self, center_x, center_y, radius, flow_r, flow_g, strength):
         """
@@ -1490,74 +2087,45 @@ class FlowmapCanvas(QOpenGLWidget):
         tex_h, tex_w = self.texture_size[1], self.texture_size[0]
         modified_regions = []
 
-        # 检查笔刷与边缘的关系
-        brush_min_x = center_x - radius
-        brush_max_x = center_x + radius
-        brush_min_y = center_y - radius
-        brush_max_y = center_y + radius
-
-        # 确定需要哪些镜像位置 - 使用布尔运算加速
-        need_left_mirror = brush_min_x < 0
-        need_right_mirror = brush_max_x >= tex_w
-        need_top_mirror = brush_min_y < 0
-        need_bottom_mirror = brush_max_y >= tex_h
+        # 纹理在两个方向上都是周期性的（着色器以 GL_REPEAT / fract 采样），
+        # 笔刷越过边缘的部分等价于平移整数个纹理尺寸后的笔刷副本。
+        # 分别求出两个轴上与纹理相交的平移量，组合后即为所有副本（角落副本自然包含在内）
+        x_offsets = self.get_seamless_offsets(center_x, radius, tex_w)
+        y_offsets = self.get_seamless_offsets(center_y, radius, tex_h)
 
         # 快速检查：如果不需要任何镜像，直接返回
-        if not (need_left_mirror or need_right_mirror or need_top_mirror or need_bottom_mirror):
+        if len(x_offsets) == 1 and len(y_offsets) == 1:
             return []
 
-        # 使用列表推导式批量创建镜像位置
-        mirror_positions = []
-
-        # 边缘镜像
-        if need_right_mirror:
-            mirror_positions.append((center_x - tex_w, center_y))
-        if need_left_mirror:
-            mirror_positions.append((center_x + tex_w, center_y))
-        if need_bottom_mirror:
-            mirror_positions.append((center_x, center_y - tex_h))
-        if need_top_mirror:
-            mirror_positions.append((center_x, center_y + tex_h))
-
-        # 角落镜像 - 使用布尔逻辑组合加速
-        corner_mirrors = [
-            (need_left_mirror and need_top_mirror, (center_x + tex_w, center_y + tex_h)),
-            (need_right_mirror and need_top_mirror, (center_x - tex_w, center_y + tex_h)),
-            (need_left_mirror and need_bottom_mirror, (center_x + tex_w, center_y - tex_h)),
-            (need_right_mirror and need_bottom_mirror, (center_x - tex_w, center_y - tex_h))
-        ]
-
-        mirror_positions.extend([pos for needed, pos in corner_mirrors if needed])
-
-        # 缓存镜像位置列表
-        self.brush_data.mirror_positions = mirror_positions
-
-        # 批量处理所有镜像位置 - 计算一次半径的平方
-        radius_sq = radius * radius
-        int_radius = int(radius)
-
-        # 对每个需要的镜像位置应用笔刷效果
-        for mirror_x, mirror_y in mirror_positions:
-            # 快速有效范围检查 - 使用整数运算
-            if mirror_x < -int_radius or mirror_x >= tex_w + int_radius or mirror_y < -int_radius or mirror_y >= tex_h + int_radius:
-                continue
-
-            # 计算笔刷区域范围 - 采用整数边界
-            min_x = max(0, int(mirror_x - radius))
-            max_x = min(tex_w, int(mirror_x + radius) + 1)
+        # 对每个需要的镜像位置应用笔刷效果，直接遍历两个轴的平移量，不再构造位置列表
+        # 平移量本身保证副本与纹理相交，这里只需把包围盒裁剪到纹理范围内
+        for offset_y in y_offsets:
+            # 计算笔刷区域范围 - 采用整数边界，同一行的副本共用纵向范围
+            mirror_y = center_y + offset_y
             min_y = max(0, int(mirror_y - radius))
             max_y = min(tex_h, int(mirror_y + radius) + 1)
-
-            # 快速跳过无效区域
-            if min_x >= max_x or min_y >= max_y:
+            if min_y >= max_y:
                 continue
 
-            # 使用优化版应用笔刷效果
-            self.apply_brush_effect_optimized(min_x, max_x, min_y, max_y, mirror_x, mirror_y,
-                            radius, flow_r, flow_g, strength)
+            for offset_x in x_offsets:
+                # 未平移的笔刷已由调用方绘制
+                if not offset_x and not offset_y:
+                    continue
 
-            # 添加修改区域
-            modified_regions.append((min_x, min_y, max_x - min_x, max_y - min_y))
+                mirror_x = center_x + offset_x
+                min_x = max(0, int(mirror_x - radius))
+                max_x = min(tex_w, int(mirror_x + radius) + 1)
+
+                # 快速跳过无效区域
+                if min_x >= max_x:
+                    continue
+
+                # 使用优化版应用笔刷效果
+                self.apply_brush_effect_optimized(min_x, max_x, min_y, max_y, mirror_x, mirror_y,
+                                radius, flow_r, flow_g, strength)
+
+                # 添加修改区域
+                modified_regions.append((min_x, min_y, max_x - min_x, max_y - min_y))
 
         return modified_regions
 
@@ -1578,62 +2146,51 @@ class FlowmapCanvas(QOpenGLWidget):
             # 更新纹理大小以匹配图像尺寸
             self.texture_size = (width, height)
             
-            # 获取图像数据
-            img_data = np.array(img, dtype=np.uint8)
-            
-            # 翻转Y轴，确保在OpenGL中正确显示
-            img_data = np.flipud(img_data)
+            # 获取图像数据并翻转Y轴，确保在OpenGL中正确显示
+            # asarray 直接引用 PIL 导出的像素，翻转时只复制一次，得到可直接上传的连续数组
+            img_data = np.ascontiguousarray(np.asarray(img, dtype=np.uint8)[::-1])
             
             # 重新初始化flowmap数据以匹配新的图像尺寸
-            self.flowmap_data = np.zeros((height, width, 4), dtype=np.float32)
-            self.flowmap_data[..., 0] = 0.5  # 初始化为 (0, 0) 向量 -> (0.5, 0.5) 颜色
-            self.flowmap_data[..., 1] = 0.5
-            self.flowmap_data[..., 3] = 1.0  # Alpha
-
-            # 如果基础纹理已存在，则删除原纹理
-            if self.base_texture_id != 0:
-                try:
-                    glDeleteTextures(1, [self.base_texture_id])
-                    print(f"Deleted existing base texture: {self.base_texture_id}")
-                except GLError as e:
-                    print(f"Warning: Failed to delete existing texture: {e}")
-                self.base_texture_id = 0
-                
-            # 如果flowmap纹理已存在，也需要更新其大小
-            if self.flowmap_texture_id != 0:
-                try:
-                    glDeleteTextures(1, [self.flowmap_texture_id])
-                    print(f"Deleted existing flowmap texture due to size change")
-                except GLError as e:
-                    print(f"Warning: Failed to delete existing flowmap texture: {e}")
-                self.flowmap_texture_id = 0
-
-            # 创建新的底图纹理对象
-            texture_id = glGenTextures(1)
-            self.base_texture_id = texture_id
+            self.flowmap_data = np.full((height, width, 2), 0.5, dtype=np.float32)  # 初始化为 (0, 0) 向量 -> (0.5, 0.5) 颜色
+            self.pending_dirty_regions = []  # 纹理将整体重建，丢弃旧尺寸下的修改区域
+            self.pending_gpu_dabs = []
+            self.flowmap_gpu_dirty = False
 
+            # 已有的纹理对象直接复用，只在尺寸变化时重新分配存储
             if self.base_texture_id == 0:
-                print("Error: Failed to generate base texture ID.")
-                QMessageBox.critical(self, "OpenGL Error", "Failed to create texture object.")
-                self.doneCurrent()
-                return
+                # 创建新的底图纹理对象
+                texture_id = glGenTextures(1)
+                self.base_texture_id = texture_id
+                self.base_texture_alloc_size = None
 
-            print(f"Created new base texture ID: {self.base_texture_id}")
+                if self.base_texture_id == 0:
+                    print("Error: Failed to generate base texture ID.")
+                    QMessageBox.critical(self, "OpenGL Error", "Failed to create texture object.")
+                    self.doneCurrent()
+                    return
+
+                print(f"Created new base texture ID: {self.base_texture_id}")
 
             # 上传底图纹理数据
             try:
                 glBindTexture(GL_TEXTURE_2D, self.base_texture_id)
-                glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0,
-                                GL_RGBA, GL_UNSIGNED_BYTE, img_data)
+                if self.base_texture_alloc_size == (width, height):
+                    glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height,
+                                    GL_RGBA, GL_UNSIGNED_BYTE, img_data)
+                else:
+                    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0,
+                                    GL_RGBA, GL_UNSIGNED_BYTE, img_data)
+                    self.base_texture_alloc_size = (width, height)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-                # 检查上传是否成功
-                error = glGetError()
-                if error != GL_NO_ERROR:
-                    print(f"OpenGL error after texture upload: {error}")
-                    raise GLError(error, "Texture upload failed")
+                # 检查上传是否成功（仅调试时）
+                if self.gl_debug:
+                    error = glGetError()
+                    if error != GL_NO_ERROR:
+                        print(f"OpenGL error after texture upload: {error}")
+                        raise GLError(error, "Texture upload failed")
             except GLError as e:
                 print(f"OpenGL error loading base image data: {e}")
                 QMessageBox.critical(self, "OpenGL Error", f"Failed to load base image data: {e}")
@@ -1641,42 +2198,46 @@ class FlowmapCanvas(QOpenGLWidget):
                 if self.base_texture_id != 0:
                     glDeleteTextures(1, [self.base_texture_id])
                     self.base_texture_id = 0
+                    self.base_texture_alloc_size = None
                 self.doneCurrent()
                 return
             finally:
                 glBindTexture(GL_TEXTURE_2D, 0)
                 
-            # 创建新的flowmap纹理
-            flow_texture_id = glGenTextures(1)
-            self.flowmap_texture_id = flow_texture_id
-            
+            # 没有flowmap纹理时创建新的纹理
             if self.flowmap_texture_id == 0:
-                print("Error: Failed to generate flowmap texture ID.")
-                QMessageBox.critical(self, "OpenGL Error", "Failed to create flowmap texture object.")
-                self.doneCurrent()
-                return
+                flow_texture_id = glGenTextures(1)
+                self.flowmap_texture_id = flow_texture_id
+                self.flowmap_texture_alloc_size = None
+
+                if self.flowmap_texture_id == 0:
+                    print("Error: Failed to generate flowmap texture ID.")
+                    QMessageBox.critical(self, "OpenGL Error", "Failed to create flowmap texture object.")
+                    self.doneCurrent()
+                    return
                 
             # 上传flowmap纹理数据
             try:
                 glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id)
-                glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F, width, height, 0,
-                             GL_RGBA, GL_FLOAT, self.flowmap_data)
+                self.allocate_flowmap_texture(width, height)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
                 
-                # 检查上传是否成功
-                error = glGetError()
-                if error != GL_NO_ERROR:
-                    print(f"OpenGL error after flowmap texture upload: {error}")
-                    raise GLError(error, "Flowmap texture upload failed")
+                # 检查上传是否成功（仅调试时）
+                if self.gl_debug:
+                    error = glGetError()
+                    if error != GL_NO_ERROR:
+                        print(f"OpenGL error after flowmap texture upload: {error}")
+                        raise GLError(error, "Flowmap texture upload failed")
             except GLError as e:
                 print(f"OpenGL error creating flowmap texture: {e}")
                 QMessageBox.critical(self, "OpenGL Error", f"Failed to create flowmap texture: {e}")
                 if self.flowmap_texture_id != 0:
                     glDeleteTextures(1, [self.flowmap_texture_id])
                     self.flowmap_texture_id = 0
+                    self.flowmap_texture_alloc_size = None
             finally:
                 glBindTexture(GL_TEXTURE_2D, 0)
 
@@ -1726,20 +2287,7 @@ class FlowmapCanvas(QOpenGLWidget):
             width, height = img.size
             print(f"Importing flowmap: {file_path}, size: {width}x{height}")
             
-            # 获取图像数据
-            img_data = np.array(img, dtype=np.uint8)
-            
-            # 提取R和G通道
-            r_channel = img_data[..., 0].astype(np.float32) / 255.0
-            g_channel = img_data[..., 1].astype(np.float32) / 255.0
-            
-            # 应用通道反转
-            if invert_r:
-                r_channel = 1.0 - r_channel
-            if invert_g:
-                g_channel = 1.0 - g_channel
-            
-            # 如果指定了目标尺寸且与当前尺寸不同，则进行缩放
+            # 如果指定了目标尺寸且与当前尺寸不同，先缩放图像，再统一转换一次数据
             if target_size and (width, height) != target_size:
                 if use_bilinear:
                     # 使用双线性插值
@@ -1749,73 +2297,63 @@ class FlowmapCanvas(QOpenGLWidget):
                     resample_method = Image.NEAREST
                 
                 img = img.resize(target_size, resample_method)
+                print(f"已将图像从 {width}x{height} 缩放到 {target_size[0]}x{target_size[1]} 使用{resample_method}")
                 width, height = target_size
-                print(f"已将图像从 {img_data.shape[1]}x{img_data.shape[0]} 缩放到 {width}x{height} 使用{resample_method}")
-                
-                # 重新获取缩放后的数据
-                img_data = np.array(img, dtype=np.uint8)
-                r_channel = img_data[..., 0].astype(np.float32) / 255.0
-                g_channel = img_data[..., 1].astype(np.float32) / 255.0
-                
-                # 重新应用通道反转
-                if invert_r:
-                    r_channel = 1.0 - r_channel
-                if invert_g:
-                    g_channel = 1.0 - g_channel
+            
+            # 获取图像数据
+            img_data = np.asarray(img, dtype=np.uint8)
             
             # 更新纹理大小以匹配图像尺寸
             self.texture_size = (width, height)
             
-            # 翻转Y轴以匹配OpenGL坐标系（与导出时的操作相反）
-            r_channel = np.flipud(r_channel)
-            g_channel = np.flipud(g_channel)
-            
-            # 创建新的flowmap数据
-            self.flowmap_data = np.zeros((height, width, 4), dtype=np.float32)
-            self.flowmap_data[..., 0] = r_channel  # R通道
-            self.flowmap_data[..., 1] = g_channel  # G通道
-            self.flowmap_data[..., 3] = 1.0  # Alpha
-            
-            # 如果flowmap纹理已存在，则删除原纹理
-            if self.flowmap_texture_id != 0:
-                try:
-                    glDeleteTextures(1, [self.flowmap_texture_id])
-                    print(f"Deleted existing flowmap texture: {self.flowmap_texture_id}")
-                except GLError as e:
-                    print(f"Warning: Failed to delete existing flowmap texture: {e}")
-                self.flowmap_texture_id = 0
+            # 创建新的flowmap数据：R/G通道直接归一化写入，
+            # 按翻转后的行序读取，使Y轴匹配OpenGL坐标系（与导出时的操作相反）
+            self.flowmap_data = np.empty((height, width, 2), dtype=np.float32)
+            np.divide(img_data[::-1, :, :2], 255.0, out=self.flowmap_data, dtype=np.float32)
             
-            # 创建新的flowmap纹理
-            flow_texture_id = glGenTextures(1)
-            self.flowmap_texture_id = flow_texture_id
+            # 应用通道反转，原地计算
+            if invert_r:
+                np.subtract(1.0, self.flowmap_data[..., 0], out=self.flowmap_data[..., 0])
+            if invert_g:
+                np.subtract(1.0, self.flowmap_data[..., 1], out=self.flowmap_data[..., 1])
+            self.pending_dirty_regions = []  # 纹理将整体重建，丢弃旧尺寸下的修改区域
+            self.pending_gpu_dabs = []
+            self.flowmap_gpu_dirty = False
             
+            # 已有的flowmap纹理直接复用，只在尺寸变化时重新分配存储
             if self.flowmap_texture_id == 0:
-                print("Error: Failed to generate flowmap texture ID.")
-                QMessageBox.critical(self, "OpenGL Error", "Failed to create flowmap texture object.")
-                self.doneCurrent()
-                return False
+                flow_texture_id = glGenTextures(1)
+                self.flowmap_texture_id = flow_texture_id
+                self.flowmap_texture_alloc_size = None
+
+                if self.flowmap_texture_id == 0:
+                    print("Error: Failed to generate flowmap texture ID.")
+                    QMessageBox.critical(self, "OpenGL Error", "Failed to create flowmap texture object.")
+                    self.doneCurrent()
+                    return False
                 
             # 上传flowmap纹理数据
             try:
                 glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id)
-                glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F, width, height, 0,
-                             GL_RGBA, GL_FLOAT, self.flowmap_data)
+                self.allocate_flowmap_texture(width, height)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
                 glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
                 
-                # 检查上传是否成功
-                error = glGetError()
-                if error != GL_NO_ERROR:
-                    print(f"OpenGL error after flowmap texture upload: {error}")
-                    raise GLError(error, "Flowmap texture upload failed")
+                # 检查上传是否成功（仅调试时）
+                if self.gl_debug:
+                    error = glGetError()
+                    if error != GL_NO_ERROR:
+                        print(f"OpenGL error after flowmap texture upload: {error}")
+                        raise GLError(error, "Flowmap texture upload failed")
             except GLError as e:
                 print(f"OpenGL error creating flowmap texture: {e}")
                 QMessageBox.critical(self, "OpenGL Error", f"Failed to create flowmap texture: {e}")
                 if self.flowmap_texture_id != 0:
                     glDeleteTextures(1, [self.flowmap_texture_id])
                     self.flowmap_texture_id = 0
+                    self.flowmap_texture_alloc_size = None
                 self.doneCurrent()
                 return False
             finally:
@@ -1851,10 +2389,10 @@ class FlowmapCanvas(QOpenGLWidget):
         print(f"Attempting to resize Flowmap texture to {width}x{height}")
         self.texture_size = (width, height)
         # Reinitialize flowmap data
-        self.flowmap_data = np.zeros((height, width, 4), dtype=np.float32)
-        self.flowmap_data[..., 0:2] = 0.5 # R, G
-        self.flowmap_data[..., 2] = 0.0   # B
-        self.flowmap_data[..., 3] = 1.0   # A
+        self.flowmap_data = np.full((height, width, 2), 0.5, dtype=np.float32) # R, G
+        self.pending_dirty_regions = []  # 纹理将整体重建，丢弃旧尺寸下的修改区域
+        self.pending_gpu_dabs = []
+        self.flowmap_gpu_dirty = False
 
         # 确保有效的 OpenGL 上下文
         self.makeCurrent()
@@ -1862,6 +2400,7 @@ class FlowmapCanvas(QOpenGLWidget):
         if self.flowmap_texture_id == 0:
             texture_id = glGenTextures(1)
             self.flowmap_texture_id = texture_id
+            self.flowmap_texture_alloc_size = None
             if self.flowmap_texture_id == 0:
                  print("Error: Failed to generate flowmap texture ID during resize.")
                  QMessageBox.critical(self, "OpenGL Error", "Failed to create texture object during resize.")
@@ -1870,8 +2409,7 @@ class FlowmapCanvas(QOpenGLWidget):
         # Use try-finally for texture binding safety
         try:
             glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F, width, height, 0,
-                               GL_RGBA, GL_FLOAT, self.flowmap_data)
+            self.allocate_flowmap_texture(width, height)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
@@ -1912,6 +2450,9 @@ class FlowmapCanvas(QOpenGLWidget):
         
         start_time = time.time()
 
+        # 读回 GPU 笔刷的修改
+        self.sync_flowmap_from_gpu()
+
         # 获取当前纹理尺寸
         texture_height, texture_width = self.flowmap_data.shape[:2]
         
@@ -1919,29 +2460,22 @@ class FlowmapCanvas(QOpenGLWidget):
         if target_size is None:
             target_size = (texture_width, texture_height)
         
-        # 使用NumPy的向量化操作快速转换数据
-        # 1. 提取R和G通道并缩放到[0,255]范围
-        r_channel = self.flowmap_data[..., 0]
-        g_channel = self.flowmap_data[..., 1]
-        
-        # 应用通道反转
-        if invert_r:
-            r_channel = 1.0 - r_channel
-        if invert_g:
-            g_channel = 1.0 - g_channel
-            
-        # 转换为uint8
-        r_channel = (r_channel * 255).astype(np.uint8)
-        g_channel = (g_channel * 255).astype(np.uint8)
-        
-        # 2. 创建RGB数组
-        data = np.zeros((texture_height, texture_width, 3), dtype=np.uint8)
-        data[..., 0] = r_channel  # R通道
-        data[..., 1] = g_channel  # G通道
-        # B通道保持为0
-        
-        # 3. 翻转Y轴以匹配最终图像格式
-        data = np.flipud(data)
+        # 1. 创建RGB数组，B通道保持为0
+        data = np.empty((texture_height, texture_width, 3), dtype=np.uint8)
+        data[..., 2] = 0
+
+        # 2. 逐通道缩放到[0,255]并四舍五入（应用通道反转），
+        # 通过翻转Y轴的视图直接写入，省去中间数组和翻转拷贝。
+        # 使用四舍五入而不是截断：半精度纹理读回的值可能略小于 k/255，截断会让导入的贴图导出后偏差一级
+        flipped = data[::-1]
+        scratch = np.empty((texture_height, texture_width), dtype=np.float32)
+        for channel, invert in ((0, invert_r), (1, invert_g)):
+            np.multiply(self.flowmap_data[..., channel], 255.0, out=scratch)
+            if invert:
+                np.subtract(255.0, scratch, out=scratch)
+            np.rint(scratch, out=scratch)
+            np.clip(scratch, 0.0, 255.0, out=scratch)
+            np.copyto(flipped[..., channel], scratch, casting='unsafe')
 
         # 创建PIL图像
         img = Image.fromarray(data, 'RGB')
@@ -1991,23 +2525,28 @@ class FlowmapCanvas(QOpenGLWidget):
 
     def get_flowmap_preview(self):
         if self.flowmap_data is None: return QImage()
+        self.sync_flowmap_from_gpu()
         height, width, _ = self.flowmap_data.shape
         if width <= 0 or height <=0: return QImage()
 
-        # Convert float[0,1] to BGRA uint8 for QImage
-        preview_data_8bit = (np.clip(self.flowmap_data, 0.0, 1.0) * 255).astype(np.uint8)
-        bgra_data = np.zeros((height, width, 4), dtype=np.uint8)
-        bgra_data[..., 0] = 0 # Blue
-        bgra_data[..., 1] = preview_data_8bit[..., 1] # Green
-        bgra_data[..., 2] = preview_data_8bit[..., 0] # Red
-        bgra_data[..., 3] = 255 # Alpha
+        # Reuse the BGRA buffer; constant B/A channels are written only on (re)allocation
+        if self.preview_bgra is None or self.preview_bgra.shape[:2] != (height, width):
+            self.preview_bgra = np.empty((height, width, 4), dtype=np.uint8)
+            self.preview_bgra[..., 0] = 0 # Blue
+            self.preview_bgra[..., 3] = 255 # Alpha
+            self.preview_scratch = np.empty((height, width, 2), dtype=np.float32)
+        bgra_data = self.preview_bgra
+        scratch = self.preview_scratch
+
+        # Convert float[0,1] to BGRA uint8 for QImage, in place
+        np.multiply(self.flowmap_data, 255.0, out=scratch)
+        np.rint(scratch, out=scratch)
+        np.clip(scratch, 0.0, 255.0, out=scratch)
+        np.copyto(bgra_data[..., 1], scratch[..., 1], casting='unsafe') # Green
+        np.copyto(bgra_data[..., 2], scratch[..., 0], casting='unsafe') # Red
 
         bytes_per_line = width * 4
-        # Ensure data is contiguous for QImage constructor
-        if not bgra_data.flags['C_CONTIGUOUS']:
-            bgra_data = np.ascontiguousarray(bgra_data)
-
-        # Create QImage from buffer. The copy() might be important.
+        # The buffer is reused by the next call, so hand out a detached copy
         qimg = QImage(bgra_data.data, width, height, bytes_per_line, QImage.Format_RGB32).copy()
         return qimg
 
@@ -2022,10 +2561,25 @@ class FlowmapCanvas(QOpenGLWidget):
                 print(f"Deleting flowmap texture: {self.flowmap_texture_id}")
                 glDeleteTextures(1, [self.flowmap_texture_id])
                 self.flowmap_texture_id = 0
+                self.flowmap_texture_alloc_size = None
+            if self.pbo_ring:
+                self.delete_pixel_buffers()
+            if self.brush_fbo != 0:
+                glDeleteFramebuffers(1, [self.brush_fbo])
+                self.brush_fbo = 0
+                self.brush_fbo_texture_id = 0
+            if self.brush_scratch_texture_id != 0:
+                glDeleteTextures(1, [self.brush_scratch_texture_id])
+                self.brush_scratch_texture_id = 0
+                self.brush_scratch_size = (0, 0)
+            if self.brush_shader_program_id != 0:
+                glDeleteProgram(self.brush_shader_program_id)
+                self.brush_shader_program_id = 0
             if self.base_texture_id != 0:
                 print(f"Deleting base texture: {self.base_texture_id}")
                 glDeleteTextures(1, [self.base_texture_id])
                 self.base_texture_id = 0
+                self.base_texture_alloc_size = None
             if self.uv_vbo != 0:
                  print(f"Deleting UV VBO: {self.uv_vbo}")
                  glDeleteBuffers(1, [self.uv_vbo])
@@ -2085,6 +2639,11 @@ class FlowmapCanvas(QOpenGLWidget):
             window_width = max(1, self.width())
             window_height = max(1, self.height())
 
+            # 纹理和窗口尺寸都没有变化时，校正参数也不会变化
+            aspect_key = (texture_width, texture_height, window_width, window_height)
+            if aspect_key == self.aspect_ratio_key:
+                return
+
             # 计算纵横比
             ratio_texture = float(texture_width) / float(texture_height)
             ratio_window = float(window_width) / float(window_height)
@@ -2092,7 +2651,8 @@ class FlowmapCanvas(QOpenGLWidget):
             # 更新预览窗口的宽高比为纹理的宽高比
             self.preview_aspect_ratio = ratio_texture
 
-            print(f"纹理纵横比: {ratio_texture}, 窗口纵横比: {ratio_window}")
+            # 调整窗口大小时每个 resize 事件都会执行到这里，调试输出默认关闭
+            # print(f"纹理纵横比: {ratio_texture}, 窗口纵横比: {ratio_window}")
 
             # 根据纵横比差异计算校正参数
             if abs(ratio_texture - ratio_window) < 0.01:
@@ -2117,10 +2677,11 @@ class FlowmapCanvas(QOpenGLWidget):
             # 保存原始纵横比用于坐标转换
             self.texture_original_aspect_ratio = ratio_texture
 
-            print(f"应用纵横比校正: scale=({self.main_view_scale_correction_x}, {self.main_view_scale_correction_y}), offset=({self.main_view_offset_correction_x}, {self.main_view_offset_correction_y})")
+            # print(f"应用纵横比校正: scale=({self.main_view_scale_correction_x}, {self.main_view_scale_correction_y}), offset=({self.main_view_offset_correction_x}, {self.main_view_offset_correction_y})")
 
             # 更新预览窗口大小以匹配纹理比例
             self.update_preview_size()
+            self.aspect_ratio_key = aspect_key
 
         except Exception as e:
             print(f"更新纵横比出错: {e}")
@@ -2147,12 +2708,22 @@ class FlowmapCanvas(QOpenGLWidget):
 
         此函数必须生成与 shader 计算完全一致的坐标
         """
-        if self.width() <= 0 or self.height() <= 0:
-            return QPointF(0, 0)
+        scene_x, scene_y = self._map_to_scene_xy(pos.x(), pos.y())
+        return QPointF(scene_x, scene_y)
+
+    def _map_to_scene_xy(self, x, y):
+        """mapToScene 的内部版本：接受并返回普通的浮点数，不构造 Qt 对象
+
+        鼠标移动时每个笔刷点都要做坐标转换，窗口尺寸和视图参数各只读取一次。
+        """
+        width = self.width()
+        height = self.height()
+        if width <= 0 or height <= 0:
+            return 0.0, 0.0
 
         # 归一化窗口坐标到[0,1]范围（屏幕坐标，左上角为(0,0)）
-        norm_x = pos.x() / self.width()
-        norm_y_screen = pos.y() / self.height()
+        norm_x = x / width
+        norm_y_screen = y / height
 
         # 将屏幕坐标转换为 shader 的 TexCoords（左上角为(0,0)但Y向上为1）：
         # 屏幕y向下增大，因此 TexCoords.y = 1 - norm_y_screen
@@ -2164,10 +2735,12 @@ class FlowmapCanvas(QOpenGLWidget):
         corrected_y = (tex_y - self.aspect_offset_y) / max(1e-6, self.aspect_scale_y)
 
         # 应用主视图缩放与偏移的逆变换
-        scene_x = corrected_x / self.main_view_scale - self.main_view_offset.x()
-        scene_y = corrected_y / self.main_view_scale - self.main_view_offset.y()
+        offset = self.main_view_offset
+        inv_scale = 1.0 / self.main_view_scale
+        scene_x = corrected_x * inv_scale - offset.x()
+        scene_y = corrected_y * inv_scale - offset.y()
 
-        return QPointF(scene_x, scene_y)
+        return scene_x, scene_y
 
     def mapFromScene(self, scene_pos):
         """
@@ -2178,8 +2751,10 @@ class FlowmapCanvas(QOpenGLWidget):
         2. 保持与 mapToScene 和 shader 一致的坐标系约定
         """
         # 1) 内容坐标 -> TexCoords（shader空间）
-        tex_x = (scene_pos.x() + self.main_view_offset.x()) * self.main_view_scale
-        tex_y = (scene_pos.y() + self.main_view_offset.y()) * self.main_view_scale
+        offset = self.main_view_offset
+        scale = self.main_view_scale
+        tex_x = (scene_pos.x() + offset.x()) * scale
+        tex_y = (scene_pos.y() + offset.y()) * scale
 
         # 2) 应用 cover 的纵横比正向变换：Tex' = Tex * scale + offset
         tex_x = tex_x * self.aspect_scale_x + self.aspect_offset_x
@@ -2195,32 +2770,38 @@ class FlowmapCanvas(QOpenGLWidget):
 
         return QPoint(int(widget_x), int(widget_y))
 
-    def update_texture_from_data(self):
-        """直接从flowmap_data更新OpenGL纹理"""
+    def update_texture_from_data(self, region=None):
+        """直接从flowmap_data更新OpenGL纹理
+
+        region 为 (x, y, width, height) 时只上传该矩形，调用方需保证纹理的其余部分
+        与 flowmap_data 一致；默认上传整个纹理。
+        """
         if self.flowmap_texture_id == 0 or self.flowmap_data is None:
             return
 
         try:
             self.makeCurrent()
-            # 绑定纹理并更新数据
-            glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id)
-
-            # 确保数据有正确的格式 - 修复可能的浮点数到无符号字节的转换问题
-            # flowmap_data是float32类型 [0,1] 范围，需要正确地转换为 [0,255] 范围
-            h, w, c = self.flowmap_data.shape
-            data = (np.clip(self.flowmap_data, 0.0, 1.0) * 255.0).astype(np.uint8)
-
-            # 确保数据是连续的
-            if not data.flags['C_CONTIGUOUS']:
-                data = np.ascontiguousarray(data)
+            # flowmap_data 此时是完整的数据，GPU 笔刷的修改不再需要读回
+            self.flowmap_gpu_dirty = False
+            if region is None:
+                # 更新整个纹理，之前累积的修改区域已包含在内，尚未绘制的笔刷点也会被覆盖
+                self.pending_dirty_regions = []
+                self.pending_gpu_dabs = []
+                h, w = self.flowmap_data.shape[:2]
+                region = (0, 0, w, h)
+            else:
+                # 只更新局部时，先提交之前累积的修改区域
+                self.flush_dirty_regions()
 
-            # 更新整个纹理
-            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, w, h, GL_RGBA, GL_UNSIGNED_BYTE, data)
+            # 绑定纹理并更新数据（R/G 半精度，经由 PBO 环形缓冲）
+            glBindTexture(GL_TEXTURE_2D, self.flowmap_texture_id)
+            self.upload_flowmap_region(*region)
 
-            # 检查错误
-            error = glGetError()
-            if error != GL_NO_ERROR:
-                print(f"OpenGL error updating texture data: {error}")
+            # 检查错误（仅调试时）
+            if self.gl_debug:
+                error = glGetError()
+                if error != GL_NO_ERROR:
+                    print(f"OpenGL error updating texture data: {error}")
 
             glBindTexture(GL_TEXTURE_2D, 0)
             self.doneCurrent()
@@ -2232,6 +2813,26 @@ class FlowmapCanvas(QOpenGLWidget):
             traceback.print_exc()
             self.doneCurrent()
 
+    def replace_flowmap_data(self, data):
+        """用 data 替换整个 flowmap_data，只上传与当前数据不同的矩形区域
+
+        撤销/重做一次笔画时只有笔画经过的区域发生变化，不必重新上传整张纹理。
+        """
+        self.sync_flowmap_from_gpu()
+        old_data = self.flowmap_data
+        self.flowmap_data = data
+        if old_data is None or old_data.shape != data.shape:
+            self.update_texture_from_data()
+            return
+
+        changed = np.any(old_data != data, axis=2)
+        rows = np.flatnonzero(changed.any(axis=1))
+        if rows.size == 0:
+            return
+        cols = np.flatnonzero(changed.any(axis=0))
+        self.update_texture_from_data((int(cols[0]), int(rows[0]),
+                                       int(cols[-1] - cols[0]) + 1, int(rows[-1] - rows[0]) + 1))
+
     def set_graphics_api_mode(self, mode):
         """设置图形API模式，处理DirectX和OpenGL中的坐标和纹理差异
 
@@ -2243,28 +2844,20 @@ class FlowmapCanvas(QOpenGLWidget):
         old_mode = self.graphics_api_mode
         self.graphics_api_mode = mode.lower()  # 确保小写
 
-        texture_height = self.texture_size[0]
-        texture_width = self.texture_size[1]
-
-
         # 只有当模式真正改变时才处理
         if old_mode != self.graphics_api_mode:
+            # 先读回 GPU 笔刷的修改，再在 CPU 端反转通道
+            self.sync_flowmap_from_gpu()
+            g_channel = self.flowmap_data[..., 1]
             if self.graphics_api_mode == 'directx':
                 print("切换到DirectX模式 - 反转G通道")
-                # DirectX模式: 只需要反转G通道的数值
-                for y in range(texture_height):
-                    for x in range(texture_width):
-                        # 只反转G通道，R通道保持不变
-                        # 从[0,1]范围转换为反转后的值 (1.0 - 原值)
-                        self.flowmap_data[x, y, 1] = 1.0 - self.flowmap_data[x, y, 1]
+                # DirectX模式: 只需要反转G通道的数值，R通道保持不变
+                # 从[0,1]范围转换为反转后的值 (1.0 - 原值)，整个通道原地计算
+                np.subtract(1.0, g_channel, out=g_channel)
             elif old_mode == 'directx':
                 print("切换回OpenGL模式 - 还原G通道")
                 # 从DirectX切换回OpenGL模式，还原G通道的反转
-                for y in range(texture_height):
-                    for x in range(texture_width):
-                        idx = (y * texture_width + x) * 4
-                        # 只反转G通道，R通道保持不变
-                        self.flowmap_data[x, y, 1] = 1.0 - self.flowmap_data[x, y, 1]
+                np.subtract(1.0, g_channel, out=g_channel)
 
             # 更新纹理数据到GPU
             self.update_texture_from_data()
@@ -2284,134 +2877,24 @@ class FlowmapCanvas(QOpenGLWidget):
         self.update()
 
 
-    def apply_improved_seamless_brush(self, center_x, center_y, radius, flow_r, flow_g, strength):
-        """
-        改进的四方连续笔刷实现，处理边缘重叠区域
-
-        数学原理：
-        在四方连续纹理中，左右边缘和上下边缘需要无缝衔接。
-        当笔刷与边缘重叠时，笔刷效果需要在相应的对侧边缘重复出现。
-
-        具体来说，当笔刷中心点(x,y)与纹理边缘的距离小于半径r时：
-        1. 对于左边缘(x < r)：需要在右边缘(x = width - (r - x))应用相同效果
-        2. 对于右边缘(x > width - r)：需要在左边缘(x = (x - (width - r)))应用相同效果
-        3. 对于上边缘(y < r)：需要在下边缘(y = height - (r - y))应用相同效果
-        4. 对于下边缘(y > height - r)：需要在上边缘(y = (y - (height - r)))应用相同效果
-
-        此外，还需要处理四个角落的情况，这需要在对角的三个位置应用相同效果。
-        """
-        tex_h, tex_w = self.texture_size[1], self.texture_size[0]
-
-        # 使用正方形区域进行检测，确保更准确的边界检测
-        # 如果笔刷不靠近任何边缘，直接返回
-        radius_sq = radius * radius
-
-        # 四方连续处理涉及多个复制点，基于笔刷位置和纹理大小
-        # 创建笔刷区域的边界框
-        brush_min_x = center_x - radius
-        brush_max_x = center_x + radius
-        brush_min_y = center_y - radius
-        brush_max_y = center_y + radius
-
-        # 检查是否需要四方连续处理
-        needs_wrap_x_left = brush_min_x < 0
-        needs_wrap_x_right = brush_max_x >= tex_w
-        needs_wrap_y_top = brush_min_y < 0
-        needs_wrap_y_bottom = brush_max_y >= tex_h
-
-        if not (needs_wrap_x_left or needs_wrap_x_right or needs_wrap_y_top or needs_wrap_y_bottom):
-            return  # 笔刷完全在纹理内部，不需要四方连续处理
-
-        brush_positions = []  # 存储需要复制笔刷效果的位置
-
-        # 处理水平边缘 - 左右方向
-        if needs_wrap_x_left:
-            # 在右侧创建一个笔刷
-            wrap_x = center_x + tex_w
-            brush_positions.append((wrap_x, center_y))
-
-        if needs_wrap_x_right:
-            # 在左侧创建一个笔刷
-            wrap_x = center_x - tex_w
-            brush_positions.append((wrap_x, center_y))
-
-        # 处理垂直边缘 - 上下方向
-        if needs_wrap_y_top:
-            # 在底部创建一个笔刷
-            wrap_y = center_y + tex_h
-            brush_positions.append((center_x, wrap_y))
-
-        if needs_wrap_y_bottom:
-            # 在顶部创建一个笔刷
-            wrap_y = center_y - tex_h
-            brush_positions.append((center_x, wrap_y))
-
-        # 处理角落 - 需要在对角位置也创建笔刷
-        if needs_wrap_x_left and needs_wrap_y_top:
-            wrap_x = center_x + tex_w
-            wrap_y = center_y + tex_h
-            brush_positions.append((wrap_x, wrap_y))
-
-        if needs_wrap_x_right and needs_wrap_y_top:
-            wrap_x = center_x - tex_w
-            wrap_y = center_y + tex_h
-            brush_positions.append((wrap_x, wrap_y))
-
-        if needs_wrap_x_left and needs_wrap_y_bottom:
-            wrap_x = center_x + tex_w
-            wrap_y = center_y - tex_h
-            brush_positions.append((wrap_x, wrap_y))
-
-        if needs_wrap_x_right and needs_wrap_y_bottom:
-            wrap_x = center_x - tex_w
-            wrap_y = center_y - tex_h
-            brush_positions.append((wrap_x, wrap_y))
-
-        # 对每个需要复制的位置应用笔刷效果
-        for wrap_center_x, wrap_center_y in brush_positions:
-            # 确保坐标在纹理范围内
-            # 注意：这里使用整数取模运算来确保坐标被正确地包装
-            wrap_center_x = wrap_center_x % tex_w
-            wrap_center_y = wrap_center_y % tex_h
-
-            # 计算笔刷区域
-            brush_min_x = max(0, int(wrap_center_x - radius))
-            brush_max_x = min(tex_w, int(wrap_center_x + radius + 1))
-            brush_min_y = max(0, int(wrap_center_y - radius))
-            brush_max_y = min(tex_h, int(wrap_center_y + radius + 1))
-
-            # 确保有效范围
-            if brush_min_x >= brush_max_x or brush_min_y >= brush_max_y:
-                continue
-
-            # 创建距离场
-            y_grid, x_grid = np.ogrid[brush_min_y:brush_max_y, brush_min_x:brush_max_x]
-            dist_sq = (x_grid - wrap_center_x) ** 2 + (y_grid - wrap_center_y) ** 2
-
-            # 计算笔刷衰减
-            t = np.clip(np.sqrt(dist_sq) / radius, 0.0, 1.0)
-            falloff = 1.0 - t * t * (3.0 - 2.0 * t)  # 平滑衰减函数
-            falloff = np.clip(falloff, 0.0, 1.0).astype(np.float32)
-
-            # 应用笔刷效果
-            current_region = self.flowmap_data[brush_min_y:brush_max_y, brush_min_x:brush_max_x, :2]
-            new_flow_color = np.array([flow_r, flow_g], dtype=np.float32)
-            falloff_expanded = falloff[..., np.newaxis] * strength
-            updated_region = current_region * (1.0 - falloff_expanded) + new_flow_color * falloff_expanded
-            self.flowmap_data[brush_min_y:brush_max_y, brush_min_x:brush_max_x, :2] = updated_region
-
     def update_preview_size(self):
         """更新预览窗口的大小以匹配纹理比例"""
         # 确保窗口尺寸已存在
         if not hasattr(self, 'window_width') or not hasattr(self, 'window_height'):
             self.window_width = self.width() or 800
             self.window_height = self.height() or 600
-            print(f"初始化窗口大小：{self.window_width}x{self.window_height}")
+            # print(f"初始化窗口大小：{self.window_width}x{self.window_height}")
         
         # 检查纹理尺寸有效性
         if self.texture_size[0] <= 0 or self.texture_size[1] <= 0:
             print("警告：纹理尺寸无效")
             return
+
+        # 纹理和窗口尺寸都没有变化时，预览窗口的大小和位置也不会变化
+        preview_key = (self.texture_size[0], self.texture_size[1], self.window_width, self.window_height)
+        if preview_key == self.preview_size_key:
+            return
+        self.preview_size_key = preview_key
             
         # 计算纹理的宽高比
         texture_aspect_ratio = float(self.texture_size[0]) / float(self.texture_size[1])
@@ -2455,7 +2938,8 @@ class FlowmapCanvas(QOpenGLWidget):
         # 设置预览窗口位置（以左上为原点的归一化坐标）
         self.preview_pos = QPointF(right_margin, top_margin)
         
-        print(f"预览窗口更新(右上)：宽度={preview_width:.3f}，高度={preview_height:.3f}，宽高比={preview_width/preview_height:.3f}，纹理比例={texture_aspect_ratio:.3f}")
+        # 调试信息：调整窗口大小时会频繁触发
+        # print(f"预览窗口更新(右上)：宽度={preview_width:.3f}，高度={preview_height:.3f}，宽高比={preview_width/preview_height:.3f}，纹理比例={texture_aspect_ratio:.3f}")
         
         # 强制更新
         self.update()
@@ -2503,14 +2987,9 @@ class FlowmapCanvas(QOpenGLWidget):
         if self.flowmap_data is None:
             return
 
-        # 创建填充颜色数组 (RGBA)
-        fill_color = np.array([r_value, g_value, 0.0, 1.0], dtype=np.float32)
-
-        # 填充整个纹理
-        h, w, _ = self.flowmap_data.shape
-        for y in range(h):
-            for x in range(w):
-                self.flowmap_data[y, x] = fill_color
+        # 按通道整体填充整个纹理 (RG)，不创建临时数组
+        self.flowmap_data[..., 0] = r_value
+        self.flowmap_data[..., 1] = g_value
 
         # 更新GPU上的纹理
         self.update_texture_from_data()
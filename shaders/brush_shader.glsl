@@ -0,0 +1,46 @@
+#version 150
+// 笔刷着色器：以 flowmap 纹理作为渲染目标，直接在 GPU 上绘制一个笔刷点
+// 视口覆盖笔刷影响区域，配合 GL_SRC_ALPHA / GL_ONE_MINUS_SRC_ALPHA 混合：
+// result = original * (1 - alpha) + color * alpha
+in vec2 TexCoords;
+out vec4 FragColor;
+
+uniform vec2 u_center;          // 笔刷中心（纹理像素坐标）
+uniform float u_radius;         // 笔刷半径（像素）
+uniform vec2 u_flowColor;       // 目标流向颜色 (R, G)
+uniform float u_strength;       // 笔刷强度
+uniform bool u_blur;            // 模糊模式
+uniform sampler2D u_source;     // 模糊模式下影响区域的副本
+uniform ivec2 u_regionMin;      // 影响区域在纹理中的起点
+uniform ivec2 u_regionSize;     // 影响区域尺寸
+uniform int u_sampleRadius;     // 模糊采样半径
+
+void main(){
+    ivec2 texel = ivec2(gl_FragCoord.xy);
+    vec2 d = vec2(texel) - u_center;
+
+    // 与 CPU 版本相同的衰减函数 (1 - d²/r²)²
+    float falloff = max(0.0, 1.0 - dot(d, d) / (u_radius * u_radius));
+    falloff *= falloff;
+
+    if (!u_blur) {
+        FragColor = vec4(u_flowColor, 0.0, falloff * u_strength);
+        return;
+    }
+
+    // 模糊模式：只处理受影响的像素，采样窗口限制在影响区域内
+    if (falloff <= 0.01) {
+        discard;
+    }
+    ivec2 local = texel - u_regionMin;
+    ivec2 lo = max(local - ivec2(u_sampleRadius), ivec2(0));
+    ivec2 hi = min(local + ivec2(u_sampleRadius), u_regionSize - ivec2(1));
+    vec2 sum = vec2(0.0);
+    for (int y = lo.y; y <= hi.y; ++y) {
+        for (int x = lo.x; x <= hi.x; ++x) {
+            sum += texelFetch(u_source, ivec2(x, y), 0).rg;
+        }
+    }
+    vec2 avg = sum / float((hi.x - lo.x + 1) * (hi.y - lo.y + 1));
+    FragColor = vec4(avg, 0.0, falloff * u_strength);
+}
@@ -21,7 +21,8 @@ void main(){
             return;
         }
     }
-    vec4 c = texture(overlayMap, uv);
+    // 纹理按图像行序上传（首行在 V = 0），翻转 V 使图像正立
+    vec4 c = texture(overlayMap, vec2(uv.x, 1.0 - uv.y));
     FragColor = vec4(c.rgb, c.a * u_opacity);
 }
 
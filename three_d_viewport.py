@@ -7,6 +7,7 @@ from OpenGL.GL import shaders
 from OpenGL.error import GLError
 import numpy as np
 import ctypes
+import math
 
 from mesh_loader import MeshData
 from brush_cursor import BrushCursorWidget
@@ -262,6 +263,23 @@ class ThreeDViewport(QOpenGLWidget):
         glViewport(0, 0, w, h)
 
     def paintGL(self):
+        # 先绘制2D画布队列中的GPU笔刷点（在画布的上下文中进行），再切回本视图的上下文
+        canvas = getattr(self, '_canvas', None)
+        if canvas is not None and getattr(canvas, 'pending_gpu_dabs', None):
+            try:
+                canvas.flush_gpu_dabs()
+            except Exception as e:
+                print(f"OpenGL error flushing canvas brush dabs: {e}")
+            self.makeCurrent()
+        # 上传2D画布中尚未提交的笔刷修改，保证3D视图显示最新的flowmap；
+        # 上传会改变当前纹理单元的绑定，必须在绑定本视图的纹理之前进行
+        if canvas is not None:
+            try:
+                flush_dirty = getattr(canvas, 'flush_dirty_regions', None)
+                if flush_dirty is not None:
+                    flush_dirty()
+            except Exception as e:
+                print(f"OpenGL error uploading canvas flowmap changes: {e}")
         glViewport(0, 0, self.width(), self.height())
         glClearColor(0.08, 0.08, 0.1, 1.0)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -976,12 +994,12 @@ class ThreeDViewport(QOpenGLWidget):
             
             # 处理UV坐标的边界跨越（类似2D的四方连续处理）
             if abs(delta_u) > 0.5:
-                delta_u = -np.sign(delta_u) * (1.0 - abs(delta_u))
+                delta_u = math.copysign(1.0 - abs(delta_u), -delta_u)
             if abs(delta_v) > 0.5:
-                delta_v = -np.sign(delta_v) * (1.0 - abs(delta_v))
+                delta_v = math.copysign(1.0 - abs(delta_v), -delta_v)
             
             # 计算UV空间中的移动长度（模拟2D中的flow vector长度）
-            uv_movement_length = np.sqrt(delta_u**2 + delta_v**2)
+            uv_movement_length = math.hypot(delta_u, delta_v)
             
             # 将UV移动距离转换为类似2D纹理像素的尺度（用于速度计算）
             # 假设UV空间[0,1]对应纹理的宽高，转换为像素尺度的移动
@@ -1099,12 +1117,12 @@ class ThreeDViewport(QOpenGLWidget):
             
             # 处理UV坐标的边界跨越（类似2D的四方连续处理）
             if abs(delta_u) > 0.5:
-                delta_u = -np.sign(delta_u) * (1.0 - abs(delta_u))
+                delta_u = math.copysign(1.0 - abs(delta_u), -delta_u)
             if abs(delta_v) > 0.5:
-                delta_v = -np.sign(delta_v) * (1.0 - abs(delta_v))
+                delta_v = math.copysign(1.0 - abs(delta_v), -delta_v)
             
             # 计算UV空间中的移动长度
-            uv_movement_length = np.sqrt(delta_u**2 + delta_v**2)
+            uv_movement_length = math.hypot(delta_u, delta_v)
             
             # 转换为像素等效距离
             tex_w, tex_h = getattr(self._canvas, 'texture_size', (1024, 1024))